@@ -0,0 +1,47 @@
+"""
+Per-book aggregates and cache invalidation shared by the consumer scripts
+The aggregate functions run their statements on the given cursor and leave error handling to the caller
+"""
+
+import time
+import pylibmc
+
+def bump_version(mc, key):
+    """
+    Increment a version counter in memcache, invalidating web caches keyed on it
+    """
+    try:
+        mc.incr(key)
+    except pylibmc.NotFound:
+        # Seed with a timestamp so versions used before the counter got lost never come back
+        mc.add(key, int(time.time()))
+
+def station_stats(curs, item, region):
+    """
+    rebuild the per-station ISK volume aggregates of a region/item book
+    """
+    sql = """DELETE FROM market_data_itemstationstat WHERE mapregion_id = %s AND invtype_id = %s;
+                INSERT INTO market_data_itemstationstat (mapregion_id, stastation_id, invtype_id, total, total_bid, total_ask, max_bid, min_ask, lastupdate)
+                SELECT mapregion_id, stastation_id, invtype_id,
+                    SUM(price * volume_remaining),
+                    SUM(CASE WHEN is_bid = TRUE THEN price * volume_remaining ELSE 0 END),
+                    SUM(CASE WHEN is_bid = FALSE THEN price * volume_remaining ELSE 0 END),
+                    MAX(CASE WHEN is_bid = TRUE AND is_suspicious = FALSE THEN price END),
+                    MIN(CASE WHEN is_bid = FALSE AND is_suspicious = FALSE THEN price END),
+                    now()
+                FROM market_data_orders
+                WHERE mapregion_id = %s AND invtype_id = %s AND is_active = 't' AND minimum_volume = 1
+                GROUP BY mapregion_id, stastation_id, invtype_id"""
+    curs.execute(sql, (region, item, region, item))
+
+def book_freshness(curs, item, region):
+    """
+    record when the active orders of a region/item book were last generated, the market scanner reads this
+    """
+    sql = """DELETE FROM market_data_itemregionfreshness WHERE mapregion_id = %s AND invtype_id = %s;
+                INSERT INTO market_data_itemregionfreshness (mapregion_id, invtype_id, generated_at)
+                SELECT mapregion_id, invtype_id, MAX(generated_at)
+                FROM market_data_orders
+                WHERE mapregion_id = %s AND invtype_id = %s AND is_active = 't'
+                GROUP BY mapregion_id, invtype_id"""
+    curs.execute(sql, (region, item, region, item))
@@ -36,9 +36,6 @@ mckey = config.get('Memcache', 'statkey')
 # Max number of greenlet workers
 MAX_NUM_POOL_WORKERS = 10
 
-# item list of stuff we want immediately updated in stats
-fastupdateitems = [34, 35, 36, 37, 38, 39, 40, 29668]
-
 # use a greenlet pool to cap the number of workers at a reasonable level
 greenlet_pool = Pool(size=MAX_NUM_POOL_WORKERS)
 
@@ -55,21 +52,6 @@ else:
 mc = pylibmc.Client([mcserver], binary=True, behaviors={"tcp_nodelay": True, "ketama": True})
 
 def main():
-    item_stats = {}
-    curs = dbcon.cursor()
-    ### preload the memcache here with initial data
-    for item in fastupdateitems:
-        sql = "SELECT buyavg, sellavg, buymedian, sellmedian FROM market_data_itemregionstat WHERE mapregion_id = 10000002 AND invtype_id = %s" % item
-        curs.execute(sql)
-        result = curs.fetchone()
-        if result:
-            item_stats['buyavg']=result[0]
-            item_stats['sellavg'] = result[1]
-            item_stats['buymedian'] = result[2]
-            item_stats['sellmedian'] = result[3]
-            print "Added to cache, item: ", item, " cache info: ", item_stats
-            mc.set(mckey + str(item), json.dumps(item_stats), time=86400)
-    
     for message in queue.consume():
         #print ">>> spawning"
         greenlet_pool.spawn(thread, message)
@@ -177,14 +159,7 @@ def thread(data):
             print "Error: ", e
             print "SQL: ", sql
         
-    # if it's an item in fastupdate, stick it in the cache
-    if data['item'] in fastupdateitems:
-        item_stats['buyavg']=buyavg
-        item_stats['sellavg'] = sellavg
-        item_stats['buymedian'] = buymedian
-        item_stats['sellmedian'] = sellmedian
-        mc.set(mckey + str(data['item']), json.dumps(item_stats), time=86400)
-        print "CACHE INSERT: ", data['item'], "[", item_stats['buyavg'], " / ", item_stats['sellavg'], "]"
+    # hot book stats are cached by emdr-dequeue.py only, it computes every field the web tier reads
         
     # insert it into the DB or update if already exists
     if history == None:
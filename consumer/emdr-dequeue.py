@@ -14,10 +14,12 @@ from datetime import date
 import pytz
 import sys
 import uuid
+import time
 import ujson as json
 # Need ast to convert from string to dictionary
 import ast
 from hotqueue import HotQueue
+import redis
 import gevent
 from gevent.pool import Pool
 from gevent import monkey; gevent.monkey.patch_all()
@@ -30,6 +32,7 @@ import pylibmc
 import numpy.ma as ma
 import numpy as np
 from scipy.stats import scoreatpercentile
+from bookstats import station_stats, book_freshness, bump_version
 
 # Load connection params from the configuration file
 config = ConfigParser.ConfigParser()
@@ -40,18 +43,24 @@ dbuser = config.get('Database', 'dbuser')
 dbpass = config.get('Database', 'dbpass')
 dbport = config.get('Database', 'dbport')
 redisdb = config.get('Redis', 'redishost')
+pricechannel = config.get('Redis', 'pricechannel')
+hotsetkey = config.get('Redis', 'hotsetkey')
 max_order_age = config.getint('Consumer', 'max_order_age')
 DEBUG = config.getboolean('Consumer', 'debug')
 TERM_OUT = config.getboolean('Consumer', 'term_out')
 mcserver = config.get('Memcache', 'server')
 mckey = config.get('Memcache', 'key')
 statkey = config.get('Memcache', 'statkey')
+stationversionkey = config.get('Memcache', 'stationversionkey')
+bookversionkey = config.get('Memcache', 'bookversionkey')
+regioningestkey = config.get('Memcache', 'regioningestkey')
 
 # Max number of greenlet workers
 MAX_NUM_POOL_WORKERS = 75
 
-# item list of stuff we want immediately updated in stats
-fastupdate = [34, 35, 36, 37, 38, 39, 40, 29668]
+# books (region-type) whose stats we push into the cache, picked from web traffic by the RefreshHotBooks task
+hotBooks = set()
+hotBooksLoaded = 0
 
 # use a greenlet pool to cap the number of workers at a reasonable level
 greenlet_pool = Pool(size=MAX_NUM_POOL_WORKERS)
@@ -59,6 +68,9 @@ greenlet_pool = Pool(size=MAX_NUM_POOL_WORKERS)
 queue = HotQueue("emdr-messages", host=redisdb, port=6379, db=0)
 statqueue =  HotQueue("e43-stats", host=redisdb, port=6379, db=0)
 
+# stats updates are published here for the live price stream, the hot book set is read from here
+rediscon = redis.StrictRedis(host=redisdb, port=6379, db=0)
+
 # Handle DBs without password
 if not dbpass:
     # Connect without password
@@ -79,9 +91,23 @@ def main():
         #print ">>> spawning"
         greenlet_pool.spawn(thread, message)
         
+def hot_books():
+    """
+    Return the set of hot books, reloaded from redis once a minute
+    """
+    global hotBooks, hotBooksLoaded
+    if time.time() - hotBooksLoaded > 60:
+        try:
+            hotBooks = rediscon.smembers(hotsetkey)
+        except redis.RedisError, e:
+            # keep pushing the last known set
+            print "Error: ", e
+        hotBooksLoaded = time.time()
+    return hotBooks
+
 def stats(item, region):
     """
-    grab the dictionary and process for that region/item combo
+    grab the dictionary and process for that region/item combo, returns the update for the live price stream
     """
     buyprice = []
     sellprice = []
@@ -230,13 +256,21 @@ def stats(item, region):
             print "Error: ", e
             print "SQL: ", sql
         
-    # if it's an item in fastupdate, stick it in the cache
-    if item in fastupdate:
-        item_stats['buyavg']=buyavg
-        item_stats['sellavg'] = sellavg
+    # if it's a hot book, stick it in the cache
+    if str(region) + "-" + str(item) in hot_books():
+        item_stats['buymean'] = buymean
+        item_stats['buyavg'] = buyavg
         item_stats['buymedian'] = buymedian
+        item_stats['buy_std_dev'] = buy_std_dev
+        item_stats['buy_95_percentile'] = buy_95_percentile
+        item_stats['buyvolume'] = sum(buycount)
+        item_stats['sellmean'] = sellmean
+        item_stats['sellavg'] = sellavg
         item_stats['sellmedian'] = sellmedian
-        mc.set(statkey + str(item), json.dumps(item_stats), time=86400)
+        item_stats['sell_std_dev'] = sell_std_dev
+        item_stats['sell_95_percentile'] = sell_95_percentile
+        item_stats['sellvolume'] = sum(sellcount)
+        mc.set(statkey + str(region) + "-" + str(item), json.dumps(item_stats), time=86400)
         #print "CACHE INSERT: ", item, "[", item_stats['buyavg'], " / ", item_stats['sellavg'], "]"
         
     # insert it into the DB or update if already exists
@@ -259,6 +293,17 @@ def stats(item, region):
         print "SQL: ", sql
         
     dbcon.commit()
+
+    # the new stats for the clients of the live price stream
+    return {'region': region,
+            'type': item,
+            'buyavg': float(buyavg),
+            'sellavg': float(sellavg),
+            'buymedian': float(buymedian),
+            'sellmedian': float(sellmedian),
+            'buyvolume': sum(buycount),
+            'sellvolume': sum(sellcount),
+            'lastupdate': str(timestamp)}
     
 #
 # Main greenlet code
@@ -292,6 +337,8 @@ def thread(message):
         updateCounter = 0
         duplicateData = 0
         hashList = []
+        touchedStations = set()
+        touchedBooks = set()
         statsData = []
         row=(5,)
         statsData.append(row)
@@ -384,6 +431,8 @@ def thread(message):
                                 statsData.append(row)
                                 row = (order.price, order.volume_remaining, order.generated_at, issue_date, msgKey, suspicious, ipHash, order.order_id)
                                 updateData.append(row)
+                                touchedStations.add(order.station_id)
+                                touchedBooks.add((order.type_id, order.region_id))
                             else:
                                 if TERM_OUT==True:
                                     print "||| Older order, not updated |||"
@@ -395,13 +444,14 @@ def thread(message):
                                 order.region_id, bid, order.price, order.order_range, order.order_duration,
                                 order.volume_remaining, order.volume_entered, order.minimum_volume, order.generated_at, issue_date, msgKey, suspicious, ipHash)
                             insertData.append(row)
+                            touchedStations.add(order.station_id)
+                            touchedBooks.add((order.type_id, order.region_id))
                             updateCounter += 1
                         row = (order.order_id, order.type_id, order.region_id)
                         if mckey + str(row[0]) in mc:
                             continue
                         insertSeen.append(row)
                         mc.set(mckey + str(row[0]), True, time=2)
-                        stats(order.type_id, order.region_id)
                     else:
                         oldCounter += 1
                         row = (3,)
@@ -436,6 +486,39 @@ def thread(message):
                 curs.executemany(sql, insertData)
                 insertData = []
     
+            # Refresh the stats, station volumes and freshness, and invalidate cached API responses of the books we just changed
+            for book in touchedBooks:
+                # once per book and after the inserts, so the live price stream gets the new state
+                update = stats(book[0], book[1])
+                try:
+                    rediscon.publish(pricechannel, json.dumps(update))
+                except redis.RedisError, e:
+                    print "Error: ", e
+                try:
+                    station_stats(curs, book[0], book[1])
+                except psycopg2.DatabaseError, e:
+                    if TERM_OUT==True:
+                        print "Station stats collision: ", book[1], " / ", book[0]
+                        print e.pgerror
+                try:
+                    book_freshness(curs, book[0], book[1])
+                except psycopg2.DatabaseError, e:
+                    if TERM_OUT==True:
+                        print "Book freshness collision: ", book[1], " / ", book[0]
+                        print e.pgerror
+                bump_version(mc, bookversionkey + str(book[1]) + "-" + str(book[0]))
+
+            # Invalidate cached per-station views of the books we just changed
+            for station in touchedStations:
+                bump_version(mc, stationversionkey + str(station))
+
+            # Remember when the books of each region last changed, bulk exports answer If-Modified-Since with it
+            if touchedBooks:
+                ingested = int(time.time())
+                for region in set(book[1] for book in touchedBooks):
+                    mc.set(regioningestkey + str(region), ingested)
+                mc.set(regioningestkey + "all", ingested)
+
             if duplicateData:
                 if TERM_OUT==True:
                     print "*** DUPLICATES: "+str(duplicateData)+" ORDERS ***"
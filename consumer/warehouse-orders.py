@@ -16,6 +16,8 @@ from gevent.pool import Pool
 from gevent import monkey; gevent.monkey.patch_all()
 from hotqueue import HotQueue
 import sys
+import pylibmc
+from bookstats import station_stats, bump_version
 
 # Load connection params from the configuration file
 config = ConfigParser.ConfigParser()
@@ -27,6 +29,10 @@ dbpass = config.get('Database', 'dbpass')
 dbport = config.get('Database', 'dbport')
 redisdb = config.get('Redis', 'redishost')
 TERM_OUT = config.get('Consumer', 'term_out')
+mcserver = config.get('Memcache', 'server')
+stationversionkey = config.get('Memcache', 'stationversionkey')
+bookversionkey = config.get('Memcache', 'bookversionkey')
+regioningestkey = config.get('Memcache', 'regioningestkey')
 
 # Connect to PostgreSQL, auto commit.
 # Handle DBs without password
@@ -95,6 +101,10 @@ def main():
 def thread(region):
     
     tcurs = dbcon.cursor()
+
+    mc = pylibmc.Client([mcserver], binary=True, behaviors={"tcp_nodelay": True, "ketama": True})
+    retired = False
+
     sql = "SELECT DISTINCT type_id FROM market_data_seenordersworking WHERE region_id=%s" % int(region)
     tcurs.execute(sql)
     result = tcurs.fetchall()
@@ -109,20 +119,40 @@ def thread(region):
             typeID = row[0]
             sql = """UPDATE market_data_orders SET is_active = 'f'
                         WHERE mapregion_id=%s AND invtype_id=%s AND is_active='t' AND market_data_orders.id
-                        NOT IN (SELECT id FROM market_data_seenordersworking WHERE mapregion_id=%s AND invtype_id=%s)""" % (region, typeID, region, typeID)
+                        NOT IN (SELECT id FROM market_data_seenordersworking WHERE mapregion_id=%s AND invtype_id=%s)
+                        RETURNING stastation_id""" % (region, typeID, region, typeID)
+            stations = set()
             try:
                 tcurs.execute(sql)
+                stations = set(station[0] for station in tcurs.fetchall())
             except psycopg2.DatabaseError, e:
                 print e.pgerror
                 pass
             if TERM_OUT==True:
                 print "Type: ", typeID, " Region: ", region, " (affected: ", tcurs.rowcount, ")"
+            # rebuild station volumes and invalidate cached views if we retired any orders of this book
+            if stations:
+                try:
+                    station_stats(tcurs, typeID, region)
+                except psycopg2.DatabaseError, e:
+                    print e.pgerror
+                    pass
+                bump_version(mc, bookversionkey + str(region) + "-" + str(typeID))
+                for station in stations:
+                    bump_version(mc, stationversionkey + str(station))
+                retired = True
             sql = "DELETE FROM market_data_seenordersworking WHERE region_id=%s AND type_id=%s" % (region, typeID)
             try:
                 tcurs.execute(sql)
             except psycopg2.DatabaseError, e:
                 print e.pgerror
                 pass
+
+    # Retired orders change the region's books, bulk exports answer If-Modified-Since with this
+    if retired:
+        changed = int(time.time())
+        mc.set(regioningestkey + str(region), changed)
+        mc.set(regioningestkey + "all", changed)
     
 if __name__ == '__main__':
     main()
@@ -97,6 +97,32 @@ def pathfind():
     
     return Response(json.dumps(path), mimetype='application/json')
 
+@app.route('/jumps', methods=['POST', 'GET'])
+def jumps():
+    """
+    Returns the number of jumps on the shortest path from one system to several others in a single call.
+    start: Source system_id (starting point)
+    finish: Comma separated list of destination system_ids
+    Unreachable destinations are left out of the resulting {system_id: jumps} mapping.
+    """
+
+    if request.method == "POST":
+        source_system = int(request.form['start'])
+        target_systems = [int(system) for system in request.form['finish'].split(',') if system]
+    else:
+        source_system = int(request.args.get('start'))
+        target_systems = [int(system) for system in request.args.get('finish').split(',') if system]
+
+    lengths = {}
+
+    if source_system in G:
+        # One breadth-first search covers all destinations
+        lengths = nx.single_source_shortest_path_length(G, source_system)
+
+    result = dict((system, lengths[system]) for system in target_systems if system in lengths)
+
+    return Response(json.dumps(result), mimetype='application/json')
+
 if __name__ == '__main__':
     app.debug = True
     # run the daemon on port 3455
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""
+Live price stream daemon
+
+Relays the stats the dequeuer publishes on a Redis pub/sub channel to clients via server-sent events.
+Clients subscribe to a set of books (region/type pairs) and only receive updates for those.
+"""
+
+from gevent import monkey; monkey.patch_all()
+from gevent.pywsgi import WSGIServer
+from gevent.queue import Queue, Empty, Full
+import gevent
+import ConfigParser
+import redis
+import ujson as json
+from flask import Flask
+from flask import request
+from flask import Response
+
+# Load connection params from the configuration file
+config = ConfigParser.ConfigParser()
+config.read(['pricestream.conf', 'local_pricestream.conf'])
+redishost = config.get('Redis', 'redishost')
+pricechannel = config.get('Redis', 'pricechannel')
+port = config.getint('Stream', 'port')
+heartbeat = config.getint('Stream', 'heartbeat')
+max_books = config.getint('Stream', 'max_books')
+queue_size = config.getint('Stream', 'queue_size')
+TERM_OUT = config.getboolean('Debug', 'term_out')
+
+# Queues of all connected clients by (region_id, type_id)
+subscribers = {}
+
+app = Flask(__name__)
+
+
+def listen():
+    """
+    Forwards every published stats update to the queues of the clients subscribed to its book.
+    Reconnects if Redis goes away.
+    """
+
+    while True:
+        try:
+            pubsub = redis.StrictRedis(host=redishost, port=6379, db=0).pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(pricechannel)
+
+            for message in pubsub.listen():
+                try:
+                    update = json.loads(message['data'])
+                    book = (int(update['region']), int(update['type']))
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+                for queue in list(subscribers.get(book, ())):
+                    try:
+                        queue.put_nowait(message['data'])
+                    except Full:
+                        # Clients which can't keep up miss updates instead of buffering forever
+                        pass
+
+        except redis.RedisError, e:
+            if TERM_OUT:
+                print "Redis error: ", e
+            gevent.sleep(1)
+
+
+def parse_books(value):
+    """
+    Returns the set of (region_id, type_id) tuples of a comma separated list of region-type pairs.
+    """
+
+    books = set()
+
+    for book in value.split(','):
+        try:
+            region_id, type_id = book.split('-')
+            books.add((int(region_id), int(type_id)))
+        except ValueError:
+            continue
+
+    return books
+
+
+@app.route('/stream', methods=['GET'])
+def stream():
+    """
+    Streams the stats of the requested books as server-sent events.
+    books: Comma separated list of region-type pairs, e.g. 10000002-34,10000002-35
+    Every update is sent as a 'stats' event with the JSON the dequeuer published.
+    """
+
+    books = parse_books(request.args.get('books', ''))
+
+    if not books or len(books) > max_books:
+        return Response('Pass between 1 and %d books.' % max_books, status=400, mimetype='text/plain')
+
+    queue = Queue(maxsize=queue_size)
+
+    def events():
+        for book in books:
+            subscribers.setdefault(book, set()).add(queue)
+
+        try:
+            # Reconnect after 5 seconds if the connection drops
+            yield 'retry: 5000\n\n'
+
+            while True:
+                try:
+                    yield 'event: stats\ndata: %s\n\n' % queue.get(timeout=heartbeat)
+                except Empty:
+                    # Keeps proxies from closing idle connections and detects gone clients
+                    yield ': heartbeat\n\n'
+        finally:
+            for book in books:
+                subscribers[book].discard(queue)
+
+                if not subscribers[book]:
+                    del subscribers[book]
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache',
+                             'X-Accel-Buffering': 'no',
+                             'Access-Control-Allow-Origin': '*'})
+
+if __name__ == '__main__':
+    gevent.spawn(listen)
+    # run the daemon on port 3456 (default)
+    WSGIServer(('', port), app).serve_forever()
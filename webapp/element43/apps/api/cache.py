@@ -0,0 +1,55 @@
+# Util
+import hashlib
+
+import eveapi
+
+from django.conf import settings
+
+# Memcache
+from apps.common.util import MemcacheStats, get_memcache_client
+
+# Pickled documents larger than this are compressed
+COMPRESS_MIN_LENGTH = 1024
+
+
+class MemcacheAPICache(object):
+    """
+    eveapi cache handler keeping parsed API documents in memcache until their cachedUntil,
+    so all workers share them and nothing is fetched or parsed twice while the API would serve the same document.
+    Its lookups are counted in stats instead of the process-wide memcache counters.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def key(self, host, path, params):
+        # Parameters contain verification codes, so they only end up in memcache hashed
+        return "e43-eveapi-%s" % hashlib.md5(repr((host, path, sorted(params.items())))).hexdigest()
+
+    def retrieve(self, host, path, params):
+        return get_memcache_client(self.stats).get(self.key(host, path, params))
+
+    def store(self, host, path, params, doc, obj):
+        # Server times on both ends, so the local clock does not matter
+        timeout = obj.cachedUntil - obj.currentTime
+
+        if timeout > 0:
+            # The parsed document is pickled - rowsets only pickle their columns and row lists
+            get_memcache_client(self.stats).set(self.key(host, path, params), obj, time=timeout,
+                                                min_compress_len=COMPRESS_MIN_LENGTH)
+
+
+# Cache handler of this process
+api_cache = MemcacheAPICache(MemcacheStats('eveapi cache'))
+
+# Keep-alive connections to the API servers of this process
+eveapi.set_pool_size(settings.EVEAPI_POOL_SIZE, settings.EVEAPI_POOL_TIMEOUT)
+
+
+def get_api_connection():
+    """
+    Returns an API connection whose calls are served from the shared cache until their documents expire.
+    Requests reuse the pooled keep-alive connections of this process.
+    """
+
+    return eveapi.EVEAPIConnection(cacheHandler=api_cache)
@@ -1,4 +1,5 @@
 import datetime
+import itertools
 import pytz
 
 import eveapi
@@ -11,6 +12,7 @@ from celery.utils.log import get_task_logger
 
 from apps.common.util import cast_empty_string_to_int, cast_empty_string_to_float
 from apps.api.models import *
+from apps.api.cache import get_api_connection
 from api_exceptions import handle_api_exception
 
 from eve_db.models import StaStation, MapSolarSystem
@@ -28,7 +30,7 @@ class ProcessConquerableStations(PeriodicTask):
     def run(self, **kwargs):
         logger.debug('Updating conquerable stations...')
 
-        api = eveapi.EVEAPIConnection()
+        api = get_api_connection()
         stations = api.eve.ConquerableStationList()
 
         for station in stations.outposts:
@@ -79,7 +81,7 @@ class ProcessResearchCharacter(Task):
 
     def run(self, character_id):
 
-        api = eveapi.EVEAPIConnection()
+        api = get_api_connection()
         character = Character.objects.get(id=character_id)
 
         # Try to fetch a valid key from DB
@@ -150,7 +152,7 @@ class ProcessWalletTransactionsCharacter(Task):
 
     def run(self, character_id):
 
-        api = eveapi.EVEAPIConnection()
+        api = get_api_connection()
         character = Character.objects.get(id=character_id)
 
         # Try to fetch a valid key from DB
@@ -168,7 +170,8 @@ class ProcessWalletTransactionsCharacter(Task):
             me = auth.character(character.id)
 
             # Get newest page - use maximum row count to minimize amount of requests
-            sheet = me.WalletTransactions(rowCount=2560)
+            # Pages are streamed, so they never sit in memory as a whole
+            sheet = me.WalletTransactions.stream(rowCount=2560)
 
         except eveapi.Error, e:
             handle_api_exception(e, apikey)
@@ -179,15 +182,18 @@ class ProcessWalletTransactionsCharacter(Task):
         while walking:
 
             # Check if new set contains any entries
-            if len(sheet.transactions):
+            transactions = sheet.rows('transactions')
+            first = next(transactions, None)
+
+            if first is not None:
 
                 # Get existing entries in DB in one run
-                existing_entries = MarketTransaction.objects.filter(character=character).values_list('journal_transaction_id', flat=True)
+                existing_entries = set(MarketTransaction.objects.filter(character=character).values_list('journal_transaction_id', flat=True))
 
                 try:
 
                     # Process transactions
-                    for transaction in sheet.transactions:
+                    for transaction in itertools.chain([first], transactions):
 
                         if transaction.journalTransactionID in existing_entries:
                             # If there already is an entry with this id, we can stop walking.
@@ -226,13 +232,16 @@ class ProcessWalletTransactionsCharacter(Task):
                         logger.warning('Removing duplicate MarketTransaction with ID: %d (journalTransactionID: %d)' % (duplicate.id, duplicate.transaction_id))
                         duplicate.delete()
 
+                # Processing may have stopped early - give the connection of this page back before the next one
+                sheet.close()
+
                 # Fetch next page if we're still walking
                 if walking:
 
                     try:
                         # Get next page based on oldest id in db - use maximum row count to minimize amount of requests
                         oldest_id = MarketTransaction.objects.filter(character=character).order_by('date')[:1][0].journal_transaction_id
-                        sheet = me.WalletTransactions(rowCount=2560, fromID=oldest_id)
+                        sheet = me.WalletTransactions.stream(rowCount=2560, fromID=oldest_id)
 
                     except IndexError:
                         logger.error('IndexError: %s (%d) has no valid types in his/her transaction history.' % (character.name, character.id))
@@ -276,7 +285,7 @@ class ProcessWalletJournalCharacter(Task):
 
     def run(self, character_id):
 
-        api = eveapi.EVEAPIConnection()
+        api = get_api_connection()
         character = Character.objects.get(id=character_id)
 
         # Try to fetch a valid key from DB
@@ -294,7 +303,8 @@ class ProcessWalletJournalCharacter(Task):
             me = auth.character(character.id)
 
             # Get newest page - use maximum row count to minimize amount of requests
-            sheet = me.WalletJournal(rowCount=2560)
+            # Pages are streamed, so they never sit in memory as a whole
+            sheet = me.WalletJournal.stream(rowCount=2560)
 
         except eveapi.Error, e:
             handle_api_exception(e, apikey)
@@ -305,13 +315,16 @@ class ProcessWalletJournalCharacter(Task):
         while walking:
 
             # Check if new set contains any entries
-            if len(sheet.transactions):
+            transactions = sheet.rows('transactions')
+            first = next(transactions, None)
+
+            if first is not None:
 
                 # Get existing entries in DB in one run
-                existing_entries = JournalEntry.objects.filter(character=character).values_list('ref_id', flat=True)
+                existing_entries = set(JournalEntry.objects.filter(character=character).values_list('ref_id', flat=True))
 
                 # Process journal entries
-                for transaction in sheet.transactions:
+                for transaction in itertools.chain([first], transactions):
 
                     try:
 
@@ -348,11 +361,14 @@ class ProcessWalletJournalCharacter(Task):
                             logger.warning('Removing duplicate JournalEntry with ID: %d (refID: %d)' % (duplicate.id, duplicate.ref_id))
                             duplicate.delete()
 
+                # Processing may have stopped early - give the connection of this page back before the next one
+                sheet.close()
+
                 # Fetch next page if we're still walking
                 if walking:
                     # Get next page based on oldest id in db - use maximum row count to minimize number of requests
                     oldest_id = JournalEntry.objects.filter(character=character).order_by('date')[:1][0].ref_id
-                    sheet = me.WalletJournal(rowCount=2560, fromID=oldest_id)
+                    sheet = me.WalletJournal.stream(rowCount=2560, fromID=oldest_id)
 
             else:
                 walking = False
@@ -376,7 +392,7 @@ class ProcessRefTypes(PeriodicTask):
 
         logger.debug('Updating refTypeIDs...')
 
-        api = eveapi.EVEAPIConnection()
+        api = get_api_connection()
         ref_types = api.eve.RefTypes()
 
         for ref_type in ref_types.refTypes:
@@ -420,7 +436,7 @@ class ProcessMarketOrdersCharacter(Task):
 
     def run(self, character_id):
 
-        api = eveapi.EVEAPIConnection()
+        api = get_api_connection()
         character = Character.objects.get(id=character_id)
 
         # Try to fetch a valid key from DB
@@ -554,7 +570,7 @@ class ProcessCharacterSheetCharacter(Task):
         attributes = ['memory', 'intelligence', 'perception', 'willpower', 'charisma']
 
         #grab an api object
-        api = eveapi.EVEAPIConnection()
+        api = get_api_connection()
         character = Character.objects.get(id=character_id)
 
         # Try to fetch a valid key from DB
@@ -663,7 +679,7 @@ class ProcessAPISkillTree(PeriodicTask):
         logger.debug("Importing skilltree...")
 
         #create our api object
-        api = eveapi.EVEAPIConnection()
+        api = get_api_connection()
 
         #load the skilltree
         skilltree = api.eve.SkillTree()
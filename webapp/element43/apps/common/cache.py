@@ -0,0 +1,79 @@
+# Util
+import math
+import random
+import time
+
+# Seconds a request waits for another one computing a missing value before computing it itself
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+
+
+def get_or_compute(mc, key, compute, timeout, stale=None, lock_timeout=30, beta=1.0):
+    """
+    Returns the value cached under key, calling compute() to build and cache it if needed.
+
+    Values are fresh for timeout seconds and kept for another stale seconds (default: timeout) after that.
+    * Probabilistic early expiration: the closer a value gets to expiring and the longer it took to compute,
+      the more likely a request recomputes it early - hot keys rarely expire at all. beta > 1 favors earlier.
+    * Single flight: only the request holding the key's lock recomputes.
+    * Stale while revalidate: while another request recomputes, expired values are served until they are stale.
+    * Requests finding no value at all wait up to LOCK_WAIT seconds for the lock holder before computing themselves.
+    """
+
+    if stale is None:
+        stale = timeout
+
+    lock_key = key + "-lock"
+    locked = False
+
+    entry = mc.get(key)
+
+    if entry is not None:
+        value, delta, expires = entry
+
+        # 1 - random() is in (0, 1], so the log is always defined and never positive
+        if time.time() - delta * beta * math.log(1 - random.random()) < expires:
+            return value
+
+        locked = mc.add(lock_key, True, time=lock_timeout)
+
+        # Somebody else is recomputing it
+        if not locked and time.time() < expires + stale:
+            return value
+    else:
+        locked = mc.add(lock_key, True, time=lock_timeout)
+
+        if not locked:
+            waited = 0
+
+            while waited < LOCK_WAIT:
+                time.sleep(LOCK_POLL_INTERVAL)
+                waited += LOCK_POLL_INTERVAL
+
+                entry = mc.get(key)
+
+                if entry is not None:
+                    return entry[0]
+
+    try:
+        start = time.time()
+        value = compute()
+        delta = time.time() - start
+
+        mc.set(key, (value, delta, time.time() + timeout), time=int(math.ceil(timeout + stale)))
+    finally:
+        if locked:
+            mc.delete(lock_key)
+
+    return value
+
+
+def peek(mc, key):
+    """
+    Returns the value cached by get_or_compute under key even if it expired, None if there is none.
+    Never computes anything.
+    """
+
+    entry = mc.get(key)
+
+    return entry[0] if entry is not None else None
@@ -0,0 +1,212 @@
+"""
+In-memory name search over published types, stations, solar systems and regions.
+
+Names are kept in a sorted list for prefix lookups and in a trigram index for substring lookups,
+so autocomplete requests never hit the DB.
+"""
+
+# Util
+import bisect
+import heapq
+import os
+import threading
+
+from django.conf import settings
+
+# Models
+from eve_db.models import InvType, StaStation, MapSolarSystem, MapRegion
+
+
+def trigrams(text):
+    """
+    Returns the set of all three character substrings of text.
+    """
+
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+class NameIndex(object):
+
+    """
+    Prefix and trigram index over (kind, id, name) entries of an SDE version.
+    """
+
+    def __init__(self, entries, sde_version=None):
+        self.entries = entries
+        self.lowered = [name.lower() for kind, id, name in entries]
+        self.sde_version = sde_version
+
+        # Sorted (lowercase name, entry index) pairs for prefix lookups
+        self.names = sorted((lowered, index) for index, lowered in enumerate(self.lowered))
+
+        # Entry indices by trigram for substring lookups
+        self.trigrams = {}
+
+        for lowered, index in self.names:
+            for trigram in trigrams(lowered):
+                self.trigrams.setdefault(trigram, set()).add(index)
+
+    def search(self, query, kinds=None, limit=20):
+        """
+        Returns up to limit (kind, id, name) entries whose name contains query, ignoring case.
+        Names starting with the query come first, then names with a word starting with it, then all others -
+        shorter names first within each group. Only entries of the given kinds are returned if kinds is set.
+        """
+
+        query = query.strip().lower()
+
+        if len(query) < 3:
+            return []
+
+        # Substring candidates have every trigram of the query - intersect the smallest posting lists first
+        postings = sorted((self.trigrams.get(trigram, ()) for trigram in trigrams(query)), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+
+        # Whole-name prefix matches are found by bisection, the rest is verified against the name
+        position = bisect.bisect_left(self.names, (query,))
+        prefix_matches = set()
+
+        while position < len(self.names) and self.names[position][0].startswith(query):
+            prefix_matches.add(self.names[position][1])
+            position += 1
+
+        ranked = []
+
+        for index in candidates:
+            if kinds is not None and self.entries[index][0] not in kinds:
+                continue
+
+            lowered = self.lowered[index]
+
+            if index in prefix_matches:
+                rank = 0
+            elif (' ' + query) in lowered or ('-' + query) in lowered:
+                rank = 1
+            elif query in lowered:
+                rank = 2
+            else:
+                continue
+
+            ranked.append((rank, len(lowered), lowered, index))
+
+        return [self.entries[hit[3]] for hit in heapq.nsmallest(limit, ranked)]
+
+
+def build_index():
+    """
+    Loads all searchable names from the DB and returns a new index.
+    """
+
+    entries = []
+
+    for id, name in InvType.objects.filter(is_published=True, market_group__isnull=False).values_list('id', 'name'):
+        entries.append(('type', id, name))
+
+    for id, name in StaStation.objects.values_list('id', 'name'):
+        entries.append(('station', id, name))
+
+    for id, name in MapSolarSystem.objects.values_list('id', 'name'):
+        entries.append(('system', id, name))
+
+    for id, name in MapRegion.objects.values_list('id', 'name'):
+        entries.append(('region', id, name))
+
+    return NameIndex([entry for entry in entries if entry[2]], settings.SDE_VERSION)
+
+
+def is_current(index):
+    """
+    Tells whether index was built from the SDE version in use.
+    """
+
+    return index is not None and index.sde_version == settings.SDE_VERSION
+
+
+# The index of this process, replaced as a whole on rebuilds
+index = None
+
+# Locks and flags of the process that created them. A forked worker inherits them without the threads
+# holding or setting them, so it starts over with its own - see check_owner.
+owner = None
+index_lock = None
+build_lock = None
+rebuilding = None
+
+
+def check_owner():
+    """
+    Gives this process its own locks and flags unless it created them itself.
+    An index inherited through a fork is kept, it is still valid.
+    """
+
+    global owner, index_lock, build_lock, rebuilding
+
+    if owner != os.getpid():
+        index_lock = threading.Lock()
+        build_lock = threading.Lock()
+        rebuilding = threading.Event()
+        owner = os.getpid()
+
+
+def rebuild_index():
+    """
+    Replaces the index of this process with a freshly built one, unless another build got there first.
+    """
+
+    global index
+
+    try:
+        with build_lock:
+            if not is_current(index):
+                index = build_index()
+    finally:
+        rebuilding.clear()
+
+
+def warm_index():
+    """
+    Starts building a new index in the background unless one is being built already.
+    Called when a worker starts, so the first search does not have to wait for the build.
+    """
+
+    check_owner()
+
+    with index_lock:
+        if rebuilding.is_set():
+            return
+
+        rebuilding.set()
+
+    thread = threading.Thread(target=rebuild_index)
+    thread.daemon = True
+    thread.start()
+
+
+def get_index():
+    """
+    Returns the search index of this process, building it if the worker has none yet.
+    An index of an older SDE version keeps answering while a new one is built in the background.
+    """
+
+    global index
+
+    check_owner()
+
+    if index is None:
+        # Waits for a build already under way instead of starting a second one
+        with build_lock:
+            if index is None:
+                index = build_index()
+
+    elif not is_current(index):
+        warm_index()
+
+    return index
+
+
+def search(query, kinds=None, limit=20):
+    """
+    Returns up to limit (kind, id, name) entries matching query, see NameIndex.search.
+    """
+
+    return get_index().search(query, kinds, limit)
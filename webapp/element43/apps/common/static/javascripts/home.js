@@ -45,8 +45,8 @@ $(document).ready(function() {
 
   var url = '/stats/' + region + '/' + params;
 
-  // Define stat loader
-  var stat_loader = function load_stats(data) {
+  // Define stat updater
+  var update_stats = function(data) {
 
     // Iterate over types
     $.each(data.typestats, function(type_key, type_val) {
@@ -108,19 +108,74 @@ $(document).ready(function() {
         }
       });
     });
+  };
+
+  // Define stat loader
+  var stat_loader = function load_stats(data) {
+    update_stats(data);
 
     // Schdeule next reload
     reload();
   };
 
-  // Load initial dataset
-  $.getJSON(url, stat_loader);
-
   function reload() {
     setTimeout(function() {
       $.getJSON(url, stat_loader);
     }, 5000);
   }
 
+  // Subscribe to the live price stream, moves are relative to the last history median
+  function stream(data) {
+    var history_medians = {};
+
+    $.each(data.typestats, function(type_key, type_val) {
+      history_medians[type_key] = {
+        bid: type_val.bid_median + type_val.bid_median_move,
+        ask: type_val.ask_median + type_val.ask_median_move
+      };
+    });
+
+    var books = $.map(types, function(type) {
+      return region + '-' + type;
+    }).join(',');
+
+    var source = new EventSource(price_stream_url + '?books=' + books);
+
+    source.addEventListener('stats', function(event) {
+      var stats = JSON.parse(event.data);
+      var history = history_medians[stats.type];
+
+      if (history === undefined) return;
+
+      var typestats = {};
+      typestats[stats.type] = {
+        bid_median: stats.buymedian,
+        bid_median_move: history.bid - stats.buymedian,
+        ask_median: stats.sellmedian,
+        ask_median_move: history.ask - stats.sellmedian
+      };
+
+      update_stats({
+        typestats: typestats
+      });
+    });
+
+    // Fall back to polling if the stream gives up
+    source.onerror = function() {
+      if (source.readyState === EventSource.CLOSED) reload();
+    };
+  }
+
+  // Load initial dataset, then either stream or poll updates
+  $.getJSON(url, function(data) {
+    update_stats(data);
+
+    if (price_stream_url && window.EventSource) {
+      stream(data);
+    } else {
+      reload();
+    }
+  });
+
   $('#ticker').ticker();
 });
\ No newline at end of file
@@ -1,9 +1,15 @@
 # utility functions
 import ast
+import json
 import urllib
+import urllib2
 import datetime
+import logging
+import threading
+import time
 import pytz
 import pylibmc
+import redis
 
 # Import settings
 from django.conf import settings
@@ -14,6 +20,8 @@ from apps.api.models import APIKey, Character, APITimer
 # Eve_DB Models
 from eve_db.models import MapSolarSystem
 
+logger = logging.getLogger(__name__)
+
 # API Access Masks
 CHARACTER_API_ACCESS_MASKS = {'AccountBalance': 1,
                               'AssetList': 2,
@@ -43,15 +51,144 @@ CHARACTER_API_ACCESS_MASKS = {'AccountBalance': 1,
                               'Contracts': 67108864,
                               'Locations': 134217728}
 
+# Seconds to wait for the pathfinder before giving up on a route
+PATHFINDER_TIMEOUT = 5
+
+
+class MemcacheStats(object):
+    """
+    Thread-safe counters of the memcache operations of this process, logged under name.
+    Logs and resets them every MEMCACHE_STATS_INTERVAL seconds.
+    """
+
+    def __init__(self, name='memcache'):
+        self.name = name
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self.calls = 0
+        self.seconds = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.sized_writes = 0
+        self.bytes_written = 0
+
+    def record(self, seconds, hits=0, misses=0, writes=0, sized_writes=0, bytes_written=0):
+        with self.lock:
+            self.calls += 1
+            self.seconds += seconds
+            self.hits += hits
+            self.misses += misses
+            self.writes += writes
+            self.sized_writes += sized_writes
+            self.bytes_written += bytes_written
+
+            if time.time() - self.started >= settings.MEMCACHE_STATS_INTERVAL:
+                logger.info("%s: %d calls, %.2f ms avg, hit ratio %.1f%% (h: %d / m: %d), %d writes, %d bytes avg per string"
+                            % (self.name, self.calls, 1000 * self.seconds / self.calls,
+                               100.0 * self.hits / (self.hits + self.misses) if self.hits + self.misses else 0,
+                               self.hits, self.misses, self.writes,
+                               self.bytes_written / self.sized_writes if self.sized_writes else 0))
+                self.reset()
+
+
+def payload_size(value):
+    """
+    Returns the number of bytes memcache stores for a string, None for any other value.
+    Other values are pickled by pylibmc, measuring them would pickle every write twice.
+    """
+
+    if isinstance(value, basestring):
+        return len(value)
+
+    return None
+
+
+class MemcacheClient(object):
+    """
+    Memcache client reserving a connection from the process-wide pool for every operation.
+    Reads and writes are timed and counted, all other methods of pylibmc.Client are passed through.
+    """
+
+    def __init__(self, pool, stats):
+        self.pool = pool
+        self.stats = stats
+
+    def call(self, method, *args, **kwargs):
+        with self.pool.reserve(block=True) as mc:
+            return getattr(mc, method)(*args, **kwargs)
+
+    def get(self, key):
+        start = time.time()
+        value = self.call('get', key)
+        self.stats.record(time.time() - start, hits=int(value is not None), misses=int(value is None))
+
+        return value
+
+    def get_multi(self, keys, *args, **kwargs):
+        keys = list(keys)
+
+        start = time.time()
+        values = self.call('get_multi', keys, *args, **kwargs)
+        self.stats.record(time.time() - start, hits=len(values), misses=len(keys) - len(values))
+
+        return values
+
+    def set(self, key, value, *args, **kwargs):
+        start = time.time()
+        result = self.call('set', key, value, *args, **kwargs)
+        size = payload_size(value)
+        self.stats.record(time.time() - start, writes=1, sized_writes=int(size is not None), bytes_written=size or 0)
+
+        return result
 
-def get_memcache_client():
+    def set_multi(self, mapping, *args, **kwargs):
+        start = time.time()
+        result = self.call('set_multi', mapping, *args, **kwargs)
+        sizes = [size for size in (payload_size(value) for value in mapping.values()) if size is not None]
+        self.stats.record(time.time() - start, writes=len(mapping), sized_writes=len(sizes), bytes_written=sum(sizes))
+
+        return result
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+
+# Process-wide memcache connection pool and counters, created on first use
+memcache_pool = None
+memcache_stats = MemcacheStats()
+memcache_pool_lock = threading.Lock()
+
+
+def get_memcache_client(stats=memcache_stats):
     """
-    Returns a ready-to-use memcache client
+    Returns a ready-to-use memcache client backed by the process-wide connection pool.
+    Its operations are counted in stats, the process-wide counters unless a cache keeps its own.
     """
 
-    return pylibmc.Client(settings.MEMCACHE_SERVER,
-                          binary=settings.MEMCACHE_BINARY,
-                          behaviors=settings.MEMCACHE_BEHAVIOUR)
+    global memcache_pool
+
+    if memcache_pool is None:
+        with memcache_pool_lock:
+            if memcache_pool is None:
+                master = pylibmc.Client(settings.MEMCACHE_SERVER,
+                                        binary=settings.MEMCACHE_BINARY,
+                                        behaviors=settings.MEMCACHE_BEHAVIOUR)
+
+                memcache_pool = pylibmc.ClientPool(master, settings.MEMCACHE_POOL_SIZE)
+
+    return MemcacheClient(memcache_pool, stats)
+
+
+def get_redis_client():
+    """
+    Returns a ready-to-use redis client
+    """
+
+    return redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
 
 
 def dictfetchall(cursor):
@@ -157,12 +294,13 @@ def find_path(start, finish, security=5, invert=0):
     finish: system_id of last system
     security: sec level of system * 10
     invert: if true (1), use security as highest seclevel you want to enter, default (0) seclevel is the lowest you want to try to use
+    Raises IOError if the pathfinder is down or does not answer within PATHFINDER_TIMEOUT seconds.
     """
 
     # Set params
     params = urllib.urlencode({'start': start, 'finish': finish, 'seclevel': security, 'invert': invert})
 
-    response = urllib.urlopen('http://localhost:3455/path', params)
+    response = urllib2.urlopen('http://localhost:3455/path', params, PATHFINDER_TIMEOUT)
 
     path_list = ast.literal_eval(response.read())
     path = []
@@ -171,3 +309,21 @@ def find_path(start, finish, security=5, invert=0):
         path.append(MapSolarSystem.objects.get(id=waypoint))
 
     return path
+
+
+def find_jumps(start, finishes):
+    """
+    Returns a dict mapping system_ids to the number of jumps on the shortest path from start.
+    start: system_id of first system
+    finishes: list of system_ids of last systems
+    Unreachable systems are missing from the result.
+    Raises IOError if the pathfinder is down or does not answer within PATHFINDER_TIMEOUT seconds.
+    """
+
+    # Set params
+    params = urllib.urlencode({'start': start, 'finish': ','.join([str(finish) for finish in finishes])})
+
+    response = urllib2.urlopen('http://localhost:3455/jumps', params, PATHFINDER_TIMEOUT)
+
+    # JSON object keys are always strings
+    return dict((int(system), jumps) for system, jumps in json.loads(response.read()).items())
@@ -1,11 +1,15 @@
 # Utils
+import hashlib
 import ujson as ujson
 
 # Imports for memcache
-import pylibmc
-from apps.common.util import get_memcache_client, dictfetchall
+from apps.common.util import get_memcache_client, get_redis_client, dictfetchall
+from apps.common.cache import get_or_compute, peek
+from apps.common.search import search as search_index
+from apps.market_data.util import region_stats
 
 # Template and context-related imports
+from django.conf import settings
 from django.db import connection
 from django.core.urlresolvers import reverse
 from django.shortcuts import render_to_response
@@ -21,6 +25,27 @@ import json
 from eve_db.models import InvType, StaStation
 from apps.market_data.models import Orders, ItemRegionStat, ItemRegionStatHistory, EmdrStats
 
+# Minerals and PLEX in The Forge are shown on the front page
+FRONT_PAGE_TYPES = [34, 35, 36, 37, 38, 39, 40, 29668]
+FRONT_PAGE_REGION = 10000002
+
+# Maximum number of results of the search page and the live search
+SEARCH_LIMIT = 100
+LIVE_SEARCH_LIMIT = 15
+
+# Seconds assembled front page stats are served before they are rebuilt
+FULLSTATS_TIMEOUT = 5
+
+
+def fullstats_key(region_id, type_ids):
+
+    """
+    Returns the memcache key of the assembled stats of a set of types in a region.
+    """
+
+    return "e43-fullstats-%s-%s" % (region_id, hashlib.md5(','.join(str(type_id) for type_id in sorted(type_ids))).hexdigest())
+
+
 """
 Those are our views. We have to use the RequestContext for CSRF protection,
 since we have a form (search) in every single of our views, as they extend 'base.haml'.
@@ -33,8 +58,8 @@ def home(request):
     Returns our static home template with a CSRF protection for our search as well as the stats layout.
     """
 
-    type_ids = [34, 35, 36, 37, 38, 39, 40, 29668]
-    region = 10000002
+    type_ids = FRONT_PAGE_TYPES
+    region = FRONT_PAGE_REGION
 
     types = InvType.objects.filter(id__in=type_ids)
 
@@ -47,9 +72,11 @@ def home(request):
 
     typestats = {}
 
-    if (mc.get("e43-fullstats") is not None):
+    stat_json = peek(mc, fullstats_key(region, type_ids))
 
-        initial_stats = ujson.loads(mc.get("e43-fullstats"))
+    if stat_json is not None:
+
+        initial_stats = ujson.loads(stat_json)
 
     else:
 
@@ -68,7 +95,11 @@ def home(request):
         initial_stats = {'typestats': typestats}
 
     # Create context for CSRF protection
-    rcontext = RequestContext(request, {'type_ids': type_ids, 'types': types, 'region': region, 'stats': initial_stats})
+    rcontext = RequestContext(request, {'type_ids': type_ids,
+                                        'types': types,
+                                        'region': region,
+                                        'stats': initial_stats,
+                                        'price_stream_url': settings.PRICE_STREAM_URL})
 
     return render_to_response('home.haml', rcontext)
 
@@ -95,69 +126,57 @@ def api_docs(request):
     return render_to_response('api_docs.haml', rcontext)
 
 
-def stats_json(request, region_id):
+def front_page_stats(mc, region_id, type_ids):
 
     """
-    Returns stat JSON for the front page
+    Returns the current bid/ask medians of types in a region and their moves since the last history entry.
+    Medians come from the hot stats cache or from a single query for the types missing there.
     """
 
-    # Connect to memcache
-    mc = get_memcache_client()
-
-    # Minerals and PLEX
-    types = request.GET.getlist('type')
-    new_types = []
+    stats = region_stats(mc, get_redis_client(), region_id, type_ids)
 
-    for item in types:
-        new_types.append(int(item))
+    # Latest history entry of every type
+    history = dict((entry['invtype_id'], entry) for entry in ItemRegionStatHistory.objects.filter(mapregion_id=region_id,
+                                                                                                   invtype_id__in=type_ids)
+                                                                                           .order_by('invtype_id', '-date')
+                                                                                           .distinct('invtype_id')
+                                                                                           .values('invtype_id', 'buymedian', 'sellmedian'))
 
-    types = new_types
     typestats = {}
-    cache_item = {}
-    buymedian = 0
-    sellmedian = 0
 
-    for item in types:
+    for type_id in type_ids:
 
-        # Still works in case we have no data for that item
-        try:
-            # check to see if it's in the cache, if so use those values
-            if (mc.get("e43-stats" + str(item)) is not None):
-                cache_item = ujson.loads(mc.get("e43-stats" + str(item)))
-                buymedian = cache_item['buymedian']
-                sellmedian = cache_item['sellmedian']
-            # otherwise go to the DB for it
-            else:
+        # Moves can't be calculated without history
+        if type_id not in history:
+            continue
 
-                # Catch error if we don't have any data for that type
-                try:
-                    region_stats = ItemRegionStat.objects.filter(mapregion_id=region_id, invtype_id=item)[:1][0]
-                    buymedian = region_stats.buymedian
-                    sellmedian = region_stats.sellmedian
+        # Still works in case we have no data for that item
+        current = stats.get(type_id, {'buymedian': 0, 'sellmedian': 0})
 
-                except:
-                    buymedian = 0
-                    sellmedian = 0
+        typestats[type_id] = {'bid_median': current['buymedian'],
+                              'bid_median_move': history[type_id]['buymedian'] - current['buymedian'],
+                              'ask_median': current['sellmedian'],
+                              'ask_median_move': history[type_id]['sellmedian'] - current['sellmedian']}
 
-            region_stats_history = ItemRegionStatHistory.objects.filter(mapregion_id=region_id, invtype_id=item).order_by("-date")[:1][0]
+    return typestats
 
 
-            stats = {'bid_median': buymedian,
-                     'bid_median_move': region_stats_history.buymedian - buymedian,
-                     'ask_median': sellmedian,
-                     'ask_median_move': region_stats_history.sellmedian - sellmedian}
+def stats_json(request, region_id):
 
-            if stats:
-                typestats[item] = stats
+    """
+    Returns stat JSON for the front page
+    """
 
-        except pylibmc.Error as e:
-            print e
+    # Connect to memcache
+    mc = get_memcache_client()
 
-    # Create JSON
-    stat_json = json.dumps({'typestats': typestats})
+    # Minerals and PLEX
+    types = [int(item) for item in request.GET.getlist('type')]
 
-    # Save complete stats to memcached
-    mc.set("e43-fullstats", stat_json)
+    # Expired stats are rebuilt by a single request, the others keep getting the previous ones meanwhile
+    stat_json = get_or_compute(mc, fullstats_key(region_id, types),
+                               lambda: json.dumps({'typestats': front_page_stats(mc, region_id, types)}),
+                               timeout=FULLSTATS_TIMEOUT, stale=FULLSTATS_TIMEOUT * 60)
 
     # Return JSON without using any template
     return HttpResponse(stat_json, content_type='application/json')
@@ -167,7 +186,7 @@ def search(request):
 
     """
     This adds a basic search view to element43.
-    The names in the invTypes table are searched with a case insensitive LIKE query.
+    Published types and stations are looked up in the in-memory search index.
     """
 
     # Get query from request
@@ -177,14 +196,21 @@ def search(request):
     types = []
     stations = []
 
-    # Only if the string is longer than 2 characters start looking in the DB
+    # Only if the string is longer than 2 characters start looking for it
     if len(query) > 2:
 
-        # Load published type objects matching the name
-        types = InvType.objects.filter(name__icontains=query, is_published=True, market_group__isnull=False)
+        # Find the best matching published types and stations in the search index
+        hits = search_index(query, kinds=('type', 'station'), limit=SEARCH_LIMIT)
+
+        type_ids = [id for kind, id, name in hits if kind == 'type']
+        station_ids = [id for kind, id, name in hits if kind == 'station']
 
-        # Load stations
-        stations = StaStation.objects.filter(name__icontains=query)
+        # Load objects in the order of the ranking
+        type_objects = InvType.objects.in_bulk(type_ids)
+        station_objects = StaStation.objects.in_bulk(station_ids)
+
+        types = [type_objects[id] for id in type_ids if id in type_objects]
+        stations = [station_objects[id] for id in station_ids if id in station_objects]
 
     # If there is only one hit, directly redirect to quicklook
     if len(types) == 1 and len(stations) == 0:
@@ -207,7 +233,7 @@ def live_search(request):
 
     """
     This adds a basic live search view to element43.
-    The names in the invTypes table are searched with a case insensitive LIKE query and the result is returned as a JSON array of matching names.
+    Published types and stations are looked up in the in-memory search index and the result is returned as a JSON array of matching names.
     """
 
     if request.GET.get('query'):
@@ -222,22 +248,13 @@ def live_search(request):
     # Default to empty array
     search_json = "{query:'" + query + "', suggestions:[], data:[]}"
 
-    # Only if the string is longer than 2 characters start looking in the DB
+    # Only if the string is longer than 2 characters start looking for it
     if len(query) > 2:
 
-        # Load published type objects matching the name
-        types = InvType.objects.filter(name__icontains=query, is_published=True, market_group__isnull=False)
-
-        for single_type in types:
-            names.append(single_type.name)
-            ids.append('type_' + str(single_type.id))
-
-        # Load station
-        stations = StaStation.objects.filter(name__icontains=query)
-
-        for station in stations:
-            names.append(station.name)
-            ids.append('station_' + str(station.id))
+        # Best matching published types and stations
+        for kind, id, name in search_index(query, kinds=('type', 'station'), limit=LIVE_SEARCH_LIMIT):
+            names.append(name)
+            ids.append(kind + '_' + str(id))
 
         # Add additional data for Ajax AutoComplete
         search_json = {'query': query, 'suggestions': names, 'data': ids}
@@ -0,0 +1,90 @@
+from django.db import connection, transaction
+
+from apps.common.util import dictfetchall
+
+# Columns of the bulk order book export, in output order
+SNAPSHOT_COLUMNS = ('id', 'mapregion_id', 'mapsolarsystem_id', 'stastation_id', 'invtype_id', 'is_bid', 'price',
+                    'volume_remaining', 'volume_entered', 'minimum_volume', 'order_range', 'issue_date',
+                    'duration', 'generated_at', 'is_suspicious')
+
+
+def marketstats(type_ids, region_ids):
+
+    """
+    Returns stats, best/worst prices of active orders and the quantity traded during the last 7 days
+    for every requested type in every requested region in a single query.
+    Combinations without stats are left out.
+    """
+
+    cursor = connection.cursor()
+    params = [list(type_ids), list(region_ids),
+              list(type_ids), list(region_ids),
+              list(type_ids), list(region_ids)]
+
+    query = """SELECT s.invtype_id, s.mapregion_id,
+                      s.buyvolume, s.buyavg, s.buy_std_dev, s.buymedian, s.buy_95_percentile,
+                      s.sellvolume, s.sellavg, s.sell_std_dev, s.sellmedian, s.sell_95_percentile,
+                      s.lastupdate, o.buy_min, o.buy_max, o.sell_min, o.sell_max, h.qty
+               FROM market_data_itemregionstat s
+               LEFT OUTER JOIN (SELECT invtype_id, mapregion_id,
+                                       Min(CASE WHEN is_bid = 't' THEN price END) AS buy_min,
+                                       Max(CASE WHEN is_bid = 't' THEN price END) AS buy_max,
+                                       Min(CASE WHEN is_bid = 'f' THEN price END) AS sell_min,
+                                       Max(CASE WHEN is_bid = 'f' THEN price END) AS sell_max
+                                FROM market_data_orders
+                                WHERE is_active = 't' AND invtype_id = ANY (%s) AND mapregion_id = ANY (%s)
+                                GROUP BY invtype_id, mapregion_id ) o
+                    ON (s.invtype_id = o.invtype_id AND s.mapregion_id = o.mapregion_id)
+               LEFT OUTER JOIN (SELECT invtype_id, mapregion_id, Sum(quantity)::bigint AS qty
+                                FROM market_data_orderhistory
+                                WHERE invtype_id = ANY (%s) AND mapregion_id = ANY (%s) AND date >= now() - interval '7 days'
+                                GROUP BY invtype_id, mapregion_id ) h
+                    ON (s.invtype_id = h.invtype_id AND s.mapregion_id = h.mapregion_id)
+               WHERE s.invtype_id = ANY (%s) AND s.mapregion_id = ANY (%s);"""
+
+    # Data retrieval operation - no commit required
+    cursor.execute(query, params)
+
+    return dictfetchall(cursor)
+
+
+def order_snapshot(region_id=None, batch_size=5000):
+
+    """
+    Yields the snapshot time first and then batches of active orders (tuples in SNAPSHOT_COLUMNS order)
+    of a region, or of all regions if none is given.
+    All rows belong to the same snapshot and are read through a server-side cursor,
+    so memory use does not depend on the size of the book.
+    """
+
+    with transaction.atomic():
+        cursor = connection.cursor()
+
+        # Snapshot time and rows have to come from the same snapshot
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ;")
+        cursor.execute("SELECT now();")
+
+        yield cursor.fetchone()[0]
+
+        query = "SELECT %s FROM market_data_orders WHERE is_active = 't'" % ', '.join(SNAPSHOT_COLUMNS)
+        params = []
+
+        if region_id:
+            query += " AND mapregion_id = %s"
+            params.append(region_id)
+
+        # Named psycopg2 cursors are server-side cursors
+        server_cursor = connection.connection.cursor('e43_order_snapshot')
+
+        try:
+            server_cursor.execute(query, params)
+
+            while True:
+                rows = server_cursor.fetchmany(batch_size)
+
+                if not rows:
+                    break
+
+                yield rows
+        finally:
+            server_cursor.close()
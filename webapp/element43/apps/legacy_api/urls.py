@@ -10,4 +10,7 @@ urlpatterns = patterns('apps.legacy_api.views',
 
     # new API
     url(r'^marketstat/$', 'marketstat.marketstat', name='marketstat'),
+
+    # bulk order book export
+    url(r'^orders/snapshot/$', 'snapshot.order_snapshot_export', name='order_snapshot_export'),
 )
\ No newline at end of file
@@ -1,115 +1,268 @@
-# Template and context-related imports
-from django.shortcuts import render_to_response
-from django.template import RequestContext
+# Serializers
+import ujson
+import msgpack
 
-# Aggregation
-from django.db.models import Min
-from django.db.models import Max
-from django.db.models import Sum
+# Response
+from django.http import StreamingHttpResponse
 
-# market_data models
-from apps.market_data.models import Orders
-from apps.market_data.models import OrderHistory
-from apps.market_data.models import ItemRegionStat
+# Memcache
+from apps.common.util import get_memcache_client
+from apps.market_data.util import book_versions
 
-# utility
-import pytz
-import datetime
+# Batched data retrieval
+from apps.legacy_api.sql import marketstats
 
+# Default region: The Forge
+DEFAULT_REGION = 10000002
 
-def legacy_marketstat(request):
+# Cached fragments are invalidated by bumping the book version, this only limits staleness
+# caused by orders expiring, which does not bump it
+FRAGMENT_TIMEOUT = 300
+
+# Books looked up in memcache and loaded from the DB at once while the response is streamed
+FRAGMENT_BATCH_SIZE = 200
+
+# XML documents of both API flavors
+LEGACY_XML_HEADER = '<?xml version="1.0" encoding="utf-8"?>\n<evec_api method="marketstat_xml" version="2.0"><marketstat>'
+LEGACY_XML_FOOTER = '</marketstat></evec_api>'
+
+XML_HEADER = '<?xml version="1.0" encoding="utf-8"?>\n<e43_api method="marketstat_xml" version="1.0"><marketstat>'
+XML_FOOTER = '</marketstat></e43_api>'
+
+# Envelope of JSON and msgpack documents: {"marketstat": [type, ...]}
+JSON_HEADER = '{"marketstat":['
+JSON_FOOTER = ']}'
+
+MSGPACK_HEADER = msgpack.Packer().pack_map_header(1) + msgpack.packb('marketstat')
+
+SIDE_XML = ('<%(side)s><volume>%(volume)s</volume><avg>%(avg)s</avg><max>%(max)s</max><min>%(min)s</min>'
+            '<stddev>%(stddev)s</stddev><median>%(median)s</median><percentile>%(percentile)s</percentile></%(side)s>')
+
+
+def parse_ids(request, key):
     """
-    This will match the Eve-central api for legacy reasons
+    Returns the unique integer IDs passed in a GET parameter, in the order they were requested.
+    Accepts repeated parameters as well as comma separated lists and skips garbage.
+    """
+
+    ids = []
+
+    for value in request.GET.getlist(key):
+        for item in value.split(','):
+            try:
+                item = int(item)
+            except ValueError:
+                continue
+
+            if item not in ids:
+                ids.append(item)
+
+    return ids
 
-    TODO: multiple regions submitted, multiple typeIDs, better error handling
+
+def marketstat_fragments(request, flavor, render):
+    """
+    Yields the rendered fragments of all requested (type, region) pairs in the requested order.
+    Fragments are cached per pair and flavor until the order book of that pair changes.
+    Pairs are processed in batches while the response is streamed, each batch with one multi-get
+    and one DB query for the pairs missing from the cache.
     """
 
-    params = {}
-    mapregion = 10000002
-    result_info = []
-    # parse GET parameters and put them into a dict to make life easier
-    for key in request.GET.iterkeys():
-        params[key] = request.GET.getlist(key)
+    type_ids = parse_ids(request, 'typeid')
+    region_ids = parse_ids(request, 'regionlimit') or [DEFAULT_REGION]
 
-    try:
-        mapregion = int(params['regionlimit'][0])
-    except:
-        mapregion = 10000002
+    books = [(type_id, region_id) for type_id in type_ids for region_id in region_ids]
 
-    for item in params['typeid']:
-        stats = ItemRegionStat.objects.get(invtype_id=item,
-                                           mapregion_id=mapregion)
+    if not books:
+        return
 
-        buystats = Orders.active.filter(invtype_id=item,
-                                        mapregion_id=mapregion,
-                                        is_bid=True).aggregate(Min('price'), Max('price'))
+    mc = get_memcache_client()
 
-        sellstats = Orders.active.filter(invtype_id=item,
-                                         mapregion_id=mapregion,
-                                         is_bid=False).aggregate(Min('price'), Max('price'))
+    for start in range(0, len(books), FRAGMENT_BATCH_SIZE):
+        batch = books[start:start + FRAGMENT_BATCH_SIZE]
 
-        result_info.append({
-                           'invtype': item, 'stats': stats, 'buystats': buystats, 'sellstats': sellstats})
+        versions = book_versions(mc, batch)
+        keys = dict((book, "e43-marketstat-%s-%s-%s-%s" % (flavor, book[0], book[1], versions[book])) for book in batch)
 
-    rcontext = RequestContext(request, {'params': params,
-                                        'result_info': result_info})
+        fragments = mc.get_multi(keys.values())
+        missing = [book for book in batch if keys[book] not in fragments]
 
-    response = render_to_response(
-        'legacy_marketstat.haml', rcontext, content_type="text/xml; charset=UTF-8")
+        if missing:
+            rows = dict(((row['invtype_id'], row['mapregion_id']), row)
+                        for row in marketstats(set(book[0] for book in missing), set(book[1] for book in missing)))
 
-    response['Access-Control-Allow-Origin'] = '*'
+            # Books without stats get an empty fragment, so they don't hit the DB again either
+            new_fragments = dict((keys[book], render(rows[book]) if book in rows else '') for book in missing)
 
-    return response
+            mc.set_multi(new_fragments, time=FRAGMENT_TIMEOUT)
+            fragments.update(new_fragments)
 
+        for book in batch:
+            if fragments[keys[book]]:
+                yield fragments[keys[book]]
 
-def marketstat(request):
+
+def type_xml(row, legacy):
+    """
+    Returns the XML element of a single type in a region.
     """
-    This is our own e43 api export that provides more data than other sites
 
-    TODO: multiple regions submitted, multiple typeIDs, better error handling
+    # The legacy element has to stay compatible with EVE-Central, which has no region attribute
+    if legacy:
+        xml = '<type id="%s">' % row['invtype_id']
+    else:
+        xml = '<type id="%s" region="%s">' % (row['invtype_id'], row['mapregion_id'])
+
+    xml += SIDE_XML % {'side': 'buy',
+                       'volume': row['buyvolume'],
+                       'avg': row['buyavg'],
+                       'max': row['buy_max'],
+                       'min': row['buy_min'],
+                       'stddev': row['buy_std_dev'],
+                       'median': row['buymedian'],
+                       'percentile': row['buy_95_percentile']}
+
+    xml += SIDE_XML % {'side': 'sell',
+                       'volume': row['sellvolume'],
+                       'avg': row['sellavg'],
+                       'max': row['sell_max'],
+                       'min': row['sell_min'],
+                       'stddev': row['sell_std_dev'],
+                       'median': row['sellmedian'],
+                       'percentile': row['sell_95_percentile']}
+
+    if not legacy:
+        lastupdate = row['lastupdate'].strftime('%Y-%m-%d') if row['lastupdate'] else ''
+        xml += '<lastupdate>%s</lastupdate><traded_last_7>%s</traded_last_7>' % (lastupdate, row['qty'])
+
+    return xml + '</type>'
+
+
+def type_dict(row, legacy):
+    """
+    Returns a single type in a region as a dict with the same structure as the XML element.
     """
 
-    params = {}
-    mapregion = 10000002
-    result_info = []
+    stats = {'id': row['invtype_id'],
+             'buy': {'volume': row['buyvolume'],
+                     'avg': row['buyavg'],
+                     'max': row['buy_max'],
+                     'min': row['buy_min'],
+                     'stddev': row['buy_std_dev'],
+                     'median': row['buymedian'],
+                     'percentile': row['buy_95_percentile']},
+             'sell': {'volume': row['sellvolume'],
+                      'avg': row['sellavg'],
+                      'max': row['sell_max'],
+                      'min': row['sell_min'],
+                      'stddev': row['sell_std_dev'],
+                      'median': row['sellmedian'],
+                      'percentile': row['sell_95_percentile']}}
+
+    if not legacy:
+        stats['region'] = row['mapregion_id']
+        stats['lastupdate'] = row['lastupdate'].strftime('%Y-%m-%d') if row['lastupdate'] else None
+        stats['traded_last_7'] = row['qty']
+
+    return stats
+
+
+# Fragment renderers by (flavor, format)
+RENDERERS = {
+    ('legacy', 'xml'): lambda row: type_xml(row, True),
+    ('legacy', 'json'): lambda row: ujson.dumps(type_dict(row, True)),
+    ('legacy', 'msgpack'): lambda row: msgpack.packb(type_dict(row, True)),
+    ('e43', 'xml'): lambda row: type_xml(row, False),
+    ('e43', 'json'): lambda row: ujson.dumps(type_dict(row, False)),
+    ('e43', 'msgpack'): lambda row: msgpack.packb(type_dict(row, False)),
+}
+
+
+def stream_xml(header, fragments, footer):
+    """
+    Yields the XML document type by type, so large type lists never sit in memory as a whole.
+    """
 
-    # Get last week for history query
-    last_week = pytz.utc.localize(
-        datetime.datetime.utcnow() - datetime.timedelta(days=7))
+    yield header
 
-    # parse GET parameters and put them into a dict to make life easier
-    for key in request.GET.iterkeys():
-        params[key] = request.GET.getlist(key)
+    for fragment in fragments:
+        yield fragment
 
-    try:
-        mapregion = int(params['regionlimit'][0])
-    except:
-        mapregion = 10000002
+    yield footer
 
-    for item in params['typeid']:
-        stats = ItemRegionStat.objects.get(invtype_id=item,
-                                           mapregion_id=mapregion)
 
-        buystats = Orders.active.filter(invtype_id=item,
-                                        mapregion_id=mapregion,
-                                        is_bid=True).aggregate(Min('price'), Max('price'))
+def stream_json(fragments):
+    """
+    Yields the JSON document type by type.
+    """
 
-        sellstats = Orders.active.filter(invtype_id=item,
-                                         mapregion_id=mapregion,
-                                         is_bid=False).aggregate(Min('price'), Max('price'))
+    yield JSON_HEADER
 
-        qty = OrderHistory.objects.filter(mapregion_id=mapregion,
-                                          invtype_id=item,
-                                          date__gte=last_week).aggregate(Sum("quantity"))['quantity__sum']
+    for index, fragment in enumerate(fragments):
+        yield ',' + fragment if index else fragment
 
-        result_info.append({'invtype': item, 'qty': qty, 'stats':
-                           stats, 'buystats': buystats, 'sellstats': sellstats})
+    yield JSON_FOOTER
 
-    rcontext = RequestContext(request, {'params': params,
-                                        'result_info': result_info})
 
-    response = render_to_response('marketstat.haml', rcontext, content_type="text/xml; charset=UTF-8")
+def stream_msgpack(fragments):
+    """
+    Yields the msgpack document type by type. Packed maps can simply be concatenated after an array header.
+    The header holds the number of types, so all fragments are collected before the first byte is sent.
+    """
+
+    fragments = list(fragments)
+    packer = msgpack.Packer()
+
+    yield MSGPACK_HEADER + packer.pack_array_header(len(fragments))
+
+    for fragment in fragments:
+        yield fragment
+
+
+def marketstat_response(request, flavor, xml_header, xml_footer):
+    """
+    Returns a streaming response in the format requested by the format parameter (xml, json or msgpack).
+    Defaults to XML.
+    """
+
+    format = request.GET.get('format', 'xml')
+
+    if (flavor, format) not in RENDERERS:
+        format = 'xml'
+
+    fragments = marketstat_fragments(request, flavor + '-' + format, RENDERERS[(flavor, format)])
 
+    if format == 'json':
+        response = StreamingHttpResponse(stream_json(fragments), content_type="application/json")
+    elif format == 'msgpack':
+        response = StreamingHttpResponse(stream_msgpack(fragments), content_type="application/x-msgpack")
+    else:
+        response = StreamingHttpResponse(stream_xml(xml_header, fragments, xml_footer), content_type="text/xml; charset=UTF-8")
+
+    # May be used by any site
     response['Access-Control-Allow-Origin'] = '*'
 
     return response
+
+
+def legacy_marketstat(request):
+    """
+    This will match the Eve-central api for legacy reasons
+
+    Takes any number of typeid and regionlimit parameters and returns one type element per type and region.
+    Like EVE-Central's, type elements carry no region attribute - they are ordered by type, then by region
+    in the order the regions were requested. Pass format=json or format=msgpack for machine readable output.
+    """
+
+    return marketstat_response(request, 'legacy', LEGACY_XML_HEADER, LEGACY_XML_FOOTER)
+
+
+def marketstat(request):
+    """
+    This is our own e43 api export that provides more data than other sites
+
+    Takes any number of typeid and regionlimit parameters and returns one type element per type and region.
+    Pass format=json or format=msgpack for machine readable output.
+    """
+
+    return marketstat_response(request, 'e43', XML_HEADER, XML_FOOTER)
@@ -7,7 +7,10 @@ from django.db.models import Max
 
 # market_data models
 from apps.market_data.models import Orders
-from apps.market_data.models import ItemRegionStat
+
+# Memcache, redis and stats
+from apps.common.util import get_memcache_client, get_redis_client
+from apps.market_data.util import region_stats
 
 # utility
 import json
@@ -24,8 +27,10 @@ def quicklook(request):
     for key in request.GET.iterkeys():
         params[key]=request.GET.getlist(key)
 
-    stats = ItemRegionStat.objects.filter(invtype_id=params['typeid'][0],
-                                          mapregion_id=params['regionlimit'][0])
+    type_id = int(params['typeid'][0])
+    region_id = int(params['regionlimit'][0])
+
+    stat = region_stats(get_memcache_client(), get_redis_client(), region_id, [type_id]).get(type_id)
     buystats = Orders.active.filter(invtype_id=params['typeid'][0],
                                      mapregion_id=params['regionlimit'][0],
                                      is_bid=True).aggregate(minprice=Min('price'), maxprice=Max('price'))
@@ -39,19 +44,19 @@ def quicklook(request):
 
     buy = {}
     sell = {}
-    for stat in stats:
-        buy['mean'] = stat.buymean
-        buy['average'] = stat.buyavg
-        buy['median'] = stat.buymedian
-        buy['std_dev'] = stat.buy_std_dev
-        buy['95percentile'] = stat.buy_95_percentile
-        buy['volume'] = stat.buyvolume
-        sell['mean'] = stat.sellmean
-        sell['average'] = stat.sellavg
-        sell['median'] = stat.sellmedian
-        sell['std_dev'] = stat.sell_std_dev
-        sell['95percentile'] = stat.sell_95_percentile
-        sell['volume'] = stat.sellvolume
+    if stat is not None:
+        buy['mean'] = stat['buymean']
+        buy['average'] = stat['buyavg']
+        buy['median'] = stat['buymedian']
+        buy['std_dev'] = stat['buy_std_dev']
+        buy['95percentile'] = stat['buy_95_percentile']
+        buy['volume'] = stat['buyvolume']
+        sell['mean'] = stat['sellmean']
+        sell['average'] = stat['sellavg']
+        sell['median'] = stat['sellmedian']
+        sell['std_dev'] = stat['sell_std_dev']
+        sell['95percentile'] = stat['sell_95_percentile']
+        sell['volume'] = stat['sellvolume']
 
     buy['min'] = buystats['minprice']
     buy['max'] = buystats['maxprice']
@@ -0,0 +1,95 @@
+# Util
+import csv
+import datetime
+import ujson
+from cStringIO import StringIO
+
+# Response
+from django.http import StreamingHttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+# Memcache
+from apps.common.util import get_memcache_client
+from apps.market_data.util import last_ingest
+
+# Snapshot retrieval
+from apps.legacy_api.sql import order_snapshot, SNAPSHOT_COLUMNS
+
+
+def stream_csv(batches):
+    """
+    Yields the CSV document batch by batch, starting with a header row.
+    """
+
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(SNAPSHOT_COLUMNS)
+
+    for rows in batches:
+        writer.writerows(rows)
+
+        yield buffer.getvalue()
+
+        buffer.seek(0)
+        buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def stream_ndjson(batches):
+    """
+    Yields one JSON object per order and line, batch by batch.
+    """
+
+    for rows in batches:
+        yield ''.join(ujson.dumps(dict((column, value.isoformat() if isinstance(value, datetime.datetime) else value)
+                                       for column, value in zip(SNAPSHOT_COLUMNS, row))) + '\n' for row in rows)
+
+
+def order_snapshot_export(request):
+    """
+    Streams every active order of a region (regionid parameter) or of all regions as CSV,
+    or as newline delimited JSON with format=ndjson.
+
+    Compression is left to the GZip middleware, which compresses the stream batch by batch.
+    Answers If-Modified-Since with the time of the last ingest into the region.
+    """
+
+    try:
+        region_id = int(request.GET.get('regionid', 0))
+    except ValueError:
+        region_id = 0
+
+    format = 'ndjson' if request.GET.get('format') == 'ndjson' else 'csv'
+
+    ingested = last_ingest(get_memcache_client(), region_id)
+
+    if ingested:
+        since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE'))
+
+        if since and since >= ingested:
+            return HttpResponseNotModified()
+
+    batches = order_snapshot(region_id)
+
+    # The first item is the snapshot time - this opens the snapshot before the response starts
+    snapshot = next(batches)
+
+    if format == 'ndjson':
+        response = StreamingHttpResponse(stream_ndjson(batches), content_type="application/x-ndjson")
+    else:
+        response = StreamingHttpResponse(stream_csv(batches), content_type="text/csv")
+
+    response['Content-Disposition'] = 'attachment; filename="orders-%s-%s.%s"' % (region_id or 'all',
+                                                                                 snapshot.strftime('%Y%m%d%H%M%S'),
+                                                                                 format)
+    response['X-Snapshot-Time'] = snapshot.isoformat()
+
+    if ingested:
+        response['Last-Modified'] = http_date(ingested)
+
+    # May be used by any site
+    response['Access-Control-Allow-Origin'] = '*'
+
+    return response
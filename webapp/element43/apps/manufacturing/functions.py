@@ -10,7 +10,10 @@ from apps.manufacturing.settings import MANUFACTURING_MAX_BLUEPRINT_HISTORY, MAN
 
 # Models
 #from eve_db.models import InvBlueprintType, InvTypeMaterial, RamTypeRequirement
-from apps.market_data.models import ItemRegionStat
+
+# Memcache, redis and stats
+from apps.common.util import get_memcache_client, get_redis_client
+from apps.market_data.util import region_stats
 
 def is_producible(type_id):
     """
@@ -84,16 +87,12 @@ def calculate_material_prices(materials):
     try:
         # Build the list of material ids for which the price has to be fetched
         material_ids = [material['id'] for material in materials]
-        materials_prices = ItemRegionStat.objects.values(
-            'invtype__id',
-            'sell_95_percentile'
-        ).filter(invtype_id__in=material_ids, mapregion_id__exact=10000002)
+        materials_prices = region_stats(get_memcache_client(), get_redis_client(), 10000002, material_ids)
 
-        for material_price in materials_prices:
-            for material in materials:
-                if material['id'] == material_price['invtype__id']:
-                    material['price'] = material_price['sell_95_percentile']
-                    material['price_total'] = material_price['sell_95_percentile'] * material['quantity']
+        for material in materials:
+            if material['id'] in materials_prices:
+                material['price'] = materials_prices[material['id']]['sell_95_percentile']
+                material['price_total'] = materials_prices[material['id']]['sell_95_percentile'] * material['quantity']
     except Exception:
         connection._rollback()
 
@@ -16,7 +16,10 @@ from apps.api.models import Character
 
 # Models
 #from eve_db.models import InvBlueprintType
-from apps.market_data.models import ItemRegionStat
+
+# Memcache, redis and stats
+from apps.common.util import get_memcache_client, get_redis_client
+from apps.market_data.util import region_stats
 
 from eveigb import IGBHeaderParser
 
@@ -87,11 +90,9 @@ def calculator(request, blueprint_type_id):
             form = ManufacturingCalculatorForm(request.user, request.session.get('form_data'))
         else:
             # find the sale price for the product
-            try:
-                stat_object = ItemRegionStat.objects.get(invtype_id__exact=blueprint.product_type.id, mapregion_id__exact=10000002)
-                target_sell_price = stat_object.sell_95_percentile
-            except ItemRegionStat.DoesNotExist:
-                target_sell_price = 0
+            stats = region_stats(get_memcache_client(), get_redis_client(), 10000002,
+                                 [blueprint.product_type.id]).get(blueprint.product_type.id)
+            target_sell_price = stats['sell_95_percentile'] if stats is not None else 0
 
             initial_data = {'target_sell_price': "%.2f" % target_sell_price}
 
@@ -1,6 +1,6 @@
 $(document).ready(function() {
 	// Get market groups and initialize tree
-	$.getJSON('/static/javascripts/groups.json', function(groups) {
+	$.getJSON('/static/javascripts/groups.json?v=' + sdeVersion, function(groups) {
 		$('#tree').dynatree({
 			title: "market",
 			// Tree's name
@@ -18,7 +18,7 @@ $(document).ready(function() {
 				if(!node.data.isFolder) {
 					$('#group').html('<img src="/static/images/loading.gif"><i> Loading data...</i>');
 					$('#panel').fadeOut(250);
-					$('#group').load('/market/browse/panel/' + node.data.key + '/'); // Load right panel
+					$('#group').load('/market/browse/panel/' + node.data.key + '/?v=' + sdeVersion); // Load right panel, cached per SDE version
 				}
 			},
 			onPostInit: function(isReloading, isError) {
@@ -1,23 +1,92 @@
 # Template and context-related imports
 from django.shortcuts import render_to_response
 from django.template import RequestContext
+from django.template.loader import render_to_string
+from django.http import HttpResponse, Http404
+from django.conf import settings
+
+# Util
+import os
+import ujson
+
+# Memcache
+from apps.common.util import get_memcache_client
 
 # eve_db models
 from eve_db.models import InvType
 from eve_db.models import InvMarketGroup
 
+# Panel contents of all market groups, built by precompile_group_json.py
+PANELS_FILE = os.path.join(os.path.dirname(__file__), 'static', 'javascripts', 'panels.json')
+
+# Panels of this process by group ID, loaded on first use
+panels = None
+
+
+def get_panels():
+    """
+    Returns the precompiled panel contents by group ID, an empty dict if they were not built.
+    """
+
+    global panels
+
+    if panels is None:
+        try:
+            with open(PANELS_FILE) as panels_file:
+                panels = dict((int(group), panel) for group, panel in ujson.load(panels_file).iteritems())
+        except IOError:
+            panels = {}
+
+    return panels
+
+
+def panel_content(group):
+    """
+    Returns the name and the published types of a market group, from the precompiled panels if possible.
+    """
+
+    content = get_panels().get(group)
+
+    if content is None:
+        try:
+            market_group = InvMarketGroup.objects.get(id=group)
+        except InvMarketGroup.DoesNotExist:
+            raise Http404
+
+        content = {'name': market_group.name,
+                   'types': InvType.objects.filter(market_group=group, is_published=True).values('id', 'name', 'description')}
+
+    return content
+
 
 def panel(request, group=0):
     """
     Render panel.
+    Rendered panels only change with the SDE, so they are cached per SDE version and clients may keep them forever.
     """
 
-    # If there are types in this group render type template
-    rcontext = RequestContext(request, {'parent_name': InvMarketGroup.objects.get(id=group).name,
-                                        'types': InvType.objects.filter(market_group=group,
-                                        is_published=True)})
+    group = int(group)
+
+    mc = get_memcache_client()
+    cache_key = "e43-browser-panel-%s-%s" % (settings.SDE_VERSION, group)
+
+    html = mc.get(cache_key)
+
+    if html is None:
+        content = panel_content(group)
+
+        # If there are types in this group render type template
+        html = render_to_string('types.haml', {'parent_name': content['name'],
+                                               'types': content['types']},
+                                RequestContext(request))
+
+        # Keys contain the SDE version, so there is no need to expire them
+        mc.set(cache_key, html)
+
+    response = HttpResponse(html)
+    response['Cache-Control'] = 'public, max-age=31536000'
 
-    return render_to_response('types.haml', rcontext)
+    return response
 
 
 def browser(request, group=0):
@@ -28,9 +97,9 @@ def browser(request, group=0):
     if not group == 0:
         # If there is a group, add data to initialize tree
 
-        rcontext = RequestContext(request, {'market_group': group})
+        rcontext = RequestContext(request, {'market_group': group, 'sde_version': settings.SDE_VERSION})
         return render_to_response('browse.haml', rcontext)
 
     else:
-        rcontext = RequestContext(request, {})
+        rcontext = RequestContext(request, {'sde_version': settings.SDE_VERSION})
         return render_to_response('browse.haml', rcontext)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eve_db', '0001_initial'),
+        ('market_data', '0002_auto_20160119_0824'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemStationStat',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('total', models.FloatField(help_text=b'ISK volume of all orders')),
+                ('total_bid', models.FloatField(help_text=b'ISK volume of buy orders')),
+                ('total_ask', models.FloatField(help_text=b'ISK volume of sell orders')),
+                ('lastupdate', models.DateTimeField(help_text=b'Date the stats were updated', null=True, blank=True)),
+                ('invtype', models.ForeignKey(help_text=b'FK to type table', to='eve_db.InvType')),
+                ('mapregion', models.ForeignKey(help_text=b'FK to region table', to='eve_db.MapRegion')),
+                ('stastation', models.ForeignKey(help_text=b'FK to station table', to='eve_db.StaStation')),
+            ],
+            options={
+                'verbose_name': 'Station Stat Data',
+                'verbose_name_plural': 'Station Stats Data',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='itemstationstat',
+            unique_together=set([('stastation', 'invtype')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='itemstationstat',
+            index_together=set([('mapregion', 'invtype')]),
+        ),
+        # Initial fill from the current order books, the consumer keeps it up to date from here on
+        migrations.RunSQL(
+            """INSERT INTO market_data_itemstationstat (mapregion_id, stastation_id, invtype_id, total, total_bid, total_ask, lastupdate)
+               SELECT mapregion_id, stastation_id, invtype_id,
+                      SUM (price * volume_remaining),
+                      SUM (CASE WHEN is_bid = TRUE THEN price * volume_remaining ELSE 0 END),
+                      SUM (CASE WHEN is_bid = FALSE THEN price * volume_remaining ELSE 0 END),
+                      now()
+               FROM market_data_orders
+               WHERE is_active = TRUE AND minimum_volume = 1
+               GROUP BY mapregion_id, stastation_id, invtype_id;""",
+            "DELETE FROM market_data_itemstationstat;"
+        ),
+    ]
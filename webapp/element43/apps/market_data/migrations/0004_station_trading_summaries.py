@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eve_db', '0001_initial'),
+        ('market_data', '0003_itemstationstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemstationstat',
+            name='max_bid',
+            field=models.FloatField(help_text=b'Highest non-suspicious buy price', null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='itemstationstat',
+            name='min_ask',
+            field=models.FloatField(help_text=b'Lowest non-suspicious sell price', null=True, blank=True),
+        ),
+        migrations.CreateModel(
+            name='ItemRegionVolume',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('weekly_volume', models.BigIntegerField(help_text=b'quantity traded in the last 7 days')),
+                ('lastupdate', models.DateTimeField(help_text=b'Date the volume was updated', null=True, blank=True)),
+                ('invtype', models.ForeignKey(help_text=b'FK to type table', to='eve_db.InvType')),
+                ('mapregion', models.ForeignKey(help_text=b'FK to region table', to='eve_db.MapRegion')),
+            ],
+            options={
+                'verbose_name': 'Weekly Volume Data',
+                'verbose_name_plural': 'Weekly Volume Data',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='itemregionvolume',
+            unique_together=set([('mapregion', 'invtype')]),
+        ),
+        # Initial fill, the consumer and ProcessRegionHistory keep those up to date from here on
+        migrations.RunSQL(
+            """UPDATE market_data_itemstationstat s
+               SET max_bid = b.max_bid, min_ask = b.min_ask
+               FROM (SELECT stastation_id, invtype_id,
+                            MAX (CASE WHEN is_bid = TRUE THEN price END) AS max_bid,
+                            MIN (CASE WHEN is_bid = FALSE THEN price END) AS min_ask
+                     FROM market_data_orders
+                     WHERE is_active = TRUE AND is_suspicious = FALSE AND minimum_volume = 1
+                     GROUP BY stastation_id, invtype_id) b
+               WHERE s.stastation_id = b.stastation_id AND s.invtype_id = b.invtype_id;""",
+            migrations.RunSQL.noop
+        ),
+        migrations.RunSQL(
+            """INSERT INTO market_data_itemregionvolume (mapregion_id, invtype_id, weekly_volume, lastupdate)
+               SELECT mapregion_id, invtype_id, SUM (quantity), now()
+               FROM market_data_orderhistory
+               WHERE date >= current_date - interval '7 days'
+               GROUP BY mapregion_id, invtype_id;""",
+            "DELETE FROM market_data_itemregionvolume;"
+        ),
+    ]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_data', '0004_station_trading_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orders',
+            name='change_seq',
+            field=models.BigIntegerField(help_text=b'Position in the change feed, set by a trigger on every write', null=True, db_index=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='itemregionstat',
+            name='change_seq',
+            field=models.BigIntegerField(help_text=b'Position in the change feed, set by a trigger on every write', null=True, db_index=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='orders',
+            name='change_at',
+            field=models.DateTimeField(help_text=b'Time change_seq was taken, the feed only hands out changes old enough to be committed', null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='itemregionstat',
+            name='change_at',
+            field=models.DateTimeField(help_text=b'Time change_seq was taken, the feed only hands out changes old enough to be committed', null=True, blank=True),
+        ),
+        # Both tables share one sequence, so a single cursor covers orders and stats.
+        # Triggers catch the writes of the consumers as well as the ORM's.
+        # Existing rows are numbered first, so the feed starts out with all of them.
+        migrations.RunSQL(
+            """CREATE SEQUENCE market_data_change_seq;
+
+               UPDATE market_data_orders SET change_seq = nextval('market_data_change_seq'), change_at = now();
+               UPDATE market_data_itemregionstat SET change_seq = nextval('market_data_change_seq'), change_at = now();
+
+               CREATE FUNCTION market_data_next_change_seq() RETURNS trigger AS $$
+               BEGIN
+                   NEW.change_seq := nextval('market_data_change_seq');
+                   NEW.change_at := clock_timestamp();
+                   RETURN NEW;
+               END;
+               $$ LANGUAGE plpgsql;
+
+               CREATE TRIGGER market_data_orders_change_seq BEFORE INSERT OR UPDATE ON market_data_orders
+                   FOR EACH ROW EXECUTE PROCEDURE market_data_next_change_seq();
+
+               CREATE TRIGGER market_data_itemregionstat_change_seq BEFORE INSERT OR UPDATE ON market_data_itemregionstat
+                   FOR EACH ROW EXECUTE PROCEDURE market_data_next_change_seq();""",
+            """DROP TRIGGER market_data_itemregionstat_change_seq ON market_data_itemregionstat;
+               DROP TRIGGER market_data_orders_change_seq ON market_data_orders;
+               DROP FUNCTION market_data_next_change_seq();
+               DROP SEQUENCE market_data_change_seq;"""
+        ),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eve_db', '0001_initial'),
+        ('market_data', '0005_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemRegionFreshness',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('generated_at', models.DateTimeField(help_text=b'Newest generated_at of the active orders of this book')),
+                ('invtype', models.ForeignKey(help_text=b'FK to type table', to='eve_db.InvType')),
+                ('mapregion', models.ForeignKey(help_text=b'FK to region table', to='eve_db.MapRegion')),
+            ],
+            options={
+                'verbose_name': 'Book Freshness',
+                'verbose_name_plural': 'Book Freshness',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='itemregionfreshness',
+            unique_together=set([('mapregion', 'invtype')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='itemregionfreshness',
+            index_together=set([('mapregion', 'generated_at')]),
+        ),
+        # Initial fill, the consumer keeps it up to date from here on
+        migrations.RunSQL(
+            """INSERT INTO market_data_itemregionfreshness (mapregion_id, invtype_id, generated_at)
+               SELECT mapregion_id, invtype_id, MAX(generated_at)
+               FROM market_data_orders
+               WHERE is_active = TRUE
+               GROUP BY mapregion_id, invtype_id""",
+            migrations.RunSQL.noop
+        ),
+    ]
@@ -89,12 +89,70 @@ class ItemRegionStat(models.Model):
     buy_std_dev = models.FloatField(help_text="standard deviation of buy orders")
     sell_std_dev = models.FloatField(help_text="standard deviation of sell orders")
     lastupdate = models.DateTimeField(blank=True, null=True, help_text="Date the stats were updated")
+    change_seq = models.BigIntegerField(blank=True, null=True, db_index=True,
+        help_text="Position in the change feed, set by a trigger on every write")
+    change_at = models.DateTimeField(blank=True, null=True,
+        help_text="Time change_seq was taken, the feed only hands out changes old enough to be committed")
 
     class Meta(object):
         verbose_name = "Stat Data"
         verbose_name_plural = "Stats Data"
         unique_together = ("mapregion", "invtype")
 
+class ItemStationStat(models.Model):
+    """
+    ISK volume and top of book of active orders for items on a per station basis,
+    refreshed by the consumer for every book it touches
+    """
+
+    mapregion = models.ForeignKey('eve_db.MapRegion', help_text="FK to region table")
+    stastation = models.ForeignKey('eve_db.StaStation', db_index=True, help_text="FK to station table")
+    invtype = models.ForeignKey('eve_db.InvType', help_text="FK to type table")
+    total = models.FloatField(help_text="ISK volume of all orders")
+    total_bid = models.FloatField(help_text="ISK volume of buy orders")
+    total_ask = models.FloatField(help_text="ISK volume of sell orders")
+    max_bid = models.FloatField(blank=True, null=True, help_text="Highest non-suspicious buy price")
+    min_ask = models.FloatField(blank=True, null=True, help_text="Lowest non-suspicious sell price")
+    lastupdate = models.DateTimeField(blank=True, null=True, help_text="Date the stats were updated")
+
+    class Meta(object):
+        verbose_name = "Station Stat Data"
+        verbose_name_plural = "Station Stats Data"
+        unique_together = ("stastation", "invtype")
+        index_together = ["mapregion", "invtype"]
+
+class ItemRegionVolume(models.Model):
+    """
+    Quantity traded in the last 7 days for items on a per region basis
+    refreshed when history is post-processed
+    """
+
+    mapregion = models.ForeignKey('eve_db.MapRegion', help_text="FK to region table")
+    invtype = models.ForeignKey('eve_db.InvType', help_text="FK to type table")
+    weekly_volume = models.BigIntegerField(help_text="quantity traded in the last 7 days")
+    lastupdate = models.DateTimeField(blank=True, null=True, help_text="Date the volume was updated")
+
+    class Meta(object):
+        verbose_name = "Weekly Volume Data"
+        verbose_name_plural = "Weekly Volume Data"
+        unique_together = ("mapregion", "invtype")
+
+class ItemRegionFreshness(models.Model):
+    """
+    Time the active orders of a type in a region were last generated,
+    refreshed by the consumer whenever it touches the book. Drives the region scanner.
+    """
+
+    mapregion = models.ForeignKey('eve_db.MapRegion', help_text="FK to region table")
+    invtype = models.ForeignKey('eve_db.InvType', help_text="FK to type table")
+    generated_at = models.DateTimeField(help_text="Newest generated_at of the active orders of this book")
+
+    class Meta(object):
+        verbose_name = "Book Freshness"
+        verbose_name_plural = "Book Freshness"
+        unique_together = ("mapregion", "invtype")
+        index_together = ["mapregion", "generated_at"]
+
 class ItemRegionStatHistory(models.Model):
     """
     Stats for items on a per region basis
@@ -220,6 +278,10 @@ class Orders(models.Model):
     uploader_ip_hash = models.CharField(max_length=255,
         help_text="The unique hash for the person who uploaded this message.")
     is_active = models.BooleanField(help_text="is this a live order or is it history", default = True)
+    change_seq = models.BigIntegerField(blank=True, null=True, db_index=True,
+        help_text="Position in the change feed, set by a trigger on every write")
+    change_at = models.DateTimeField(blank=True, null=True,
+        help_text="Time change_seq was taken, the feed only hands out changes old enough to be committed")
 
     # Managers
     objects = models.Manager()
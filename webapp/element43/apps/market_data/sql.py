@@ -3,41 +3,44 @@ from django.db import connection
 from apps.common.util import dictfetchall
 
 
-def bid_ask_spread(station_id=60008694, region_id=10000002, market_group_id=1413):
+# Columns the station trading report may be sorted by
+SPREAD_ORDERING = ('potential_daily_profit', 'spread', 'spread_percent', 'weekly_volume')
+
+
+def bid_ask_spread(station_id=60008694, region_id=10000002, market_group_id=1413,
+                   order_by='potential_daily_profit', limit=100, offset=0):
 
     """
     Returns top 100 spread items on a given station.
     This can especially be useful for identifying items worth for station trading if you take the volume into account.
     Defaults to Jita IV - Moon 4 - Caldari Navy Assembly Plant.
+
+    Reads the top of book from market_data_itemstationstat and the weekly volume from market_data_itemregionvolume,
+    so it does not touch the order or history tables. Results are sorted descending by one of SPREAD_ORDERING
+    and can be paginated with limit and offset.
     """
 
+    if order_by not in SPREAD_ORDERING:
+        order_by = 'potential_daily_profit'
+
     cursor = connection.cursor()
-    params = [market_group_id, station_id, station_id, region_id]
+    params = [market_group_id, station_id, region_id, limit, offset]
 
     query = """SELECT id, name, min_ask, max_bid, spread, spread_percent, weekly_volume,
                      ((min_ask - max_bid) * weekly_volume / 7) AS potential_daily_profit
                FROM (
-                    SELECT t.id, t.name, b.max_bid, a.min_ask,
-                           (a.min_ask - b.max_bid) AS spread,
-                           ((a.min_ask / b.max_bid) - 1) * 100 AS spread_percent
-                    FROM ( SELECT id, name
-                           FROM eve_db_invtype z
-                           WHERE market_group_id = %s AND is_published = 't') t
-
-                    INNER JOIN ( SELECT invtype_id, Max(price) AS max_bid
-                                 FROM market_data_orders
-                                 WHERE stastation_id = %s AND is_bid = 't' AND is_suspicious = 'f' AND minimum_volume = 1 AND is_active = 't'
-                                 GROUP BY invtype_id ) b ON (t.id = b.invtype_id AND max_bid > 0)
-                    INNER JOIN ( SELECT invtype_id, Min(price) AS min_ask
-                                 FROM market_data_orders
-                                 WHERE stastation_id = %s AND is_bid = 'f' AND is_suspicious = 'f' AND minimum_volume = 1 AND is_active = 't'
-                                 GROUP BY invtype_id ) a ON (t.id = a.invtype_id AND min_ask > 0)
+                    SELECT t.id, t.name, s.max_bid, s.min_ask, v.weekly_volume,
+                           (s.min_ask - s.max_bid) AS spread,
+                           ((s.min_ask / s.max_bid) - 1) * 100 AS spread_percent
+                    FROM eve_db_invtype t
+                    INNER JOIN market_data_itemstationstat s ON (t.id = s.invtype_id)
+                    INNER JOIN market_data_itemregionvolume v ON (t.id = v.invtype_id)
+                    WHERE t.market_group_id = %s AND t.is_published = 't'
+                          AND s.stastation_id = %s AND s.max_bid > 0 AND s.min_ask > 0
+                          AND v.mapregion_id = %s AND v.weekly_volume > 0
                 ) q
-                INNER JOIN ( SELECT invtype_id, Sum(quantity) AS weekly_volume
-                             FROM market_data_orderhistory
-                             WHERE mapregion_id = %s AND date >= current_date - interval '7 days'
-                             GROUP BY invtype_id ) v ON (q.id = invtype_id AND weekly_volume > 0)
-                ORDER BY potential_daily_profit DESC;"""
+                ORDER BY """ + order_by + """ DESC
+                LIMIT %s OFFSET %s;"""
 
     # Data retrieval operation - no commit required
     cursor.execute(query, params)
@@ -52,55 +55,78 @@ def import_markup(import_station_id=60008494, export_region_id=0, export_system_
     Passing in an export_region will do a region->station comparison.
     If 0 is passed in it will do a station->system/station.
 
+    Every row also carries the import region's weekly volume and the order depth within 1% of the
+    best prices (local bids / foreign asks), all computed in the same query.
+
     Defaults
         Export region: None
         Export system: None
         Import station: Amarr VIII (Oris) - Emperor Family Academy
         Export station: Jita IV - Moon 4 - Caldari Navy Assembly Plant
 
-    Mapping: (invTyeID, invTypeName, foreign_sell, local_buy, markup, invTyeID)
+    Mapping: (id, name, foreign_ask, local_bid, markup, weekly_volume, bid_qty_filtered, ask_qty_filtered)
     """
 
     cursor = connection.cursor()
 
-    # Build params
-    if export_region_id:
-        params = [export_region_id, import_station_id, import_station_id]
-    elif export_system_id:
-        params = [export_system_id, import_station_id, import_station_id]
-    else:
-        params = [export_station_id, import_station_id, import_station_id]
-
-    query = """SELECT *
-            FROM (
-                SELECT t.id, t.name, a.foreign_ask, b.local_bid,
-                       ((b.local_bid / a.foreign_ask) - 1) * 100 AS markup
-                FROM eve_db_invtype t
-                INNER JOIN (SELECT invtype_id, Min(price) AS foreign_ask
-                            FROM market_data_orders """
-
-    # Build query based on params
+    # Build filter on the export side based on params
     if export_region_id:
-        query += "WHERE mapregion_id = %s "
+        export_filter = "mapregion_id = %s"
+        export_id = export_region_id
     elif export_system_id:
-        query += "WHERE mapsolarsystem_id = %s "
+        export_filter = "mapsolarsystem_id = %s"
+        export_id = export_system_id
     else:
-        query += "WHERE stastation_id = %s "
-
-    query += """ AND is_bid = 'f' AND is_suspicious = 'f' AND is_active = 't' AND minimum_volume = 1
-                GROUP BY invtype_id ) a ON (t.id = a.invtype_id AND foreign_ask > 0)
-            INNER JOIN (SELECT invtype_id, Max(price) AS local_bid
-                        FROM market_data_orders
-                        WHERE stastation_id = %s AND is_bid = 't' AND is_suspicious = 'f' AND is_active = 't' AND minimum_volume = 1
-                        GROUP BY invtype_id ) b ON (t.id = b.invtype_id AND local_bid > 0)
-
-            WHERE t.id IN (SELECT DISTINCT market_data_orders.invtype_id
-                           FROM market_data_orders
-                           WHERE market_data_orders.stastation_id = %s )
-            ) q
-            WHERE q.markup > 0
-            ORDER BY q.markup DESC
-            LIMIT 100;"""
+        export_filter = "stastation_id = %s"
+        export_id = export_station_id
+
+    params = [export_id, import_station_id, import_station_id,
+              import_station_id, import_station_id, export_id]
+
+    query = """WITH q AS (
+                SELECT *
+                FROM (
+                    SELECT t.id, t.name, a.foreign_ask, b.local_bid,
+                           ((b.local_bid / a.foreign_ask) - 1) * 100 AS markup
+                    FROM eve_db_invtype t
+                    INNER JOIN (SELECT invtype_id, Min(price) AS foreign_ask
+                                FROM market_data_orders
+                                WHERE """ + export_filter + """ AND is_bid = 'f' AND is_suspicious = 'f' AND is_active = 't' AND minimum_volume = 1
+                                GROUP BY invtype_id ) a ON (t.id = a.invtype_id AND foreign_ask > 0)
+                    INNER JOIN (SELECT invtype_id, Max(price) AS local_bid
+                                FROM market_data_orders
+                                WHERE stastation_id = %s AND is_bid = 't' AND is_suspicious = 'f' AND is_active = 't' AND minimum_volume = 1
+                                GROUP BY invtype_id ) b ON (t.id = b.invtype_id AND local_bid > 0)
+
+                    WHERE t.id IN (SELECT DISTINCT market_data_orders.invtype_id
+                                   FROM market_data_orders
+                                   WHERE market_data_orders.stastation_id = %s )
+                ) m
+                WHERE m.markup > 0
+                ORDER BY m.markup DESC
+                LIMIT 100
+            )
+            SELECT q.*, v.weekly_volume, bq.bid_qty_filtered, aq.ask_qty_filtered
+            FROM q
+            LEFT OUTER JOIN (SELECT h.invtype_id, Sum(h.quantity)::bigint AS weekly_volume
+                             FROM market_data_orderhistory h
+                             INNER JOIN q ON (h.invtype_id = q.id)
+                             WHERE h.mapregion_id = (SELECT region_id FROM eve_db_stastation WHERE id = %s)
+                                   AND h.date >= now() - interval '7 days'
+                             GROUP BY h.invtype_id ) v ON (q.id = v.invtype_id)
+            LEFT OUTER JOIN (SELECT o.invtype_id, Sum(o.volume_remaining)::bigint AS bid_qty_filtered
+                             FROM market_data_orders o
+                             INNER JOIN q ON (o.invtype_id = q.id)
+                             WHERE o.stastation_id = %s AND o.is_bid = 't' AND o.is_active = 't' AND o.minimum_volume = 1
+                                   AND o.price >= q.local_bid * 0.99
+                             GROUP BY o.invtype_id ) bq ON (q.id = bq.invtype_id)
+            LEFT OUTER JOIN (SELECT o.invtype_id, Sum(o.volume_remaining)::bigint AS ask_qty_filtered
+                             FROM market_data_orders o
+                             INNER JOIN q ON (o.invtype_id = q.id)
+                             WHERE o.""" + export_filter + """ AND o.is_bid = 'f' AND o.is_active = 't' AND o.minimum_volume = 1
+                                   AND o.price <= q.foreign_ask * 1.01
+                             GROUP BY o.invtype_id ) aq ON (q.id = aq.invtype_id)
+            ORDER BY q.markup DESC;"""
 
     # Data retrieval operation - no commit required
     cursor.execute(query, params)
@@ -2,6 +2,7 @@
 import datetime
 import ast
 import pytz
+import ujson
 
 # Util
 from datetime import datetime, timedelta
@@ -14,12 +15,28 @@ from celery.utils.log import get_task_logger
 # Raw SQL
 from django.db import connection
 
+# Caches
+from apps.common.util import get_memcache_client, get_redis_client
+from apps.market_data.util import HOT_STATS_KEY, HOT_STATS_FIELDS, HOT_SCORES_KEY, HOT_SET_KEY, HOT_METRICS_KEY
+
 # Models
-from apps.market_data.models import History, OrderHistory
+from apps.market_data.models import History, OrderHistory, ItemRegionStat
 
 
 logger = get_task_logger(__name__)
 
+# Maximum number of books whose stats are kept in memcache
+HOT_BOOKS = 250
+
+# Decayed requests a book needs to be admitted to the hot set, it is evicted below half of that
+HOT_MIN_SCORE = 5
+
+# Factor applied to all request counts every run, so the hot set follows current traffic
+HOT_DECAY = 0.9
+
+# Number of books whose request counts are tracked at all
+HOT_TRACKED = 10000
+
 
 class ArchiveOrders(PeriodicTask):
 
@@ -171,8 +188,80 @@ class ProcessRegionHistory(Task):
         diff = datetime.now() - start
         OrderHistory.objects.bulk_create(bulk_list)
 
+        # Refresh the weekly volumes of that region for station trading reports
+        cursor = connection.cursor()
+        cursor.execute("""DELETE FROM market_data_itemregionvolume WHERE mapregion_id = %s;
+                          INSERT INTO market_data_itemregionvolume (mapregion_id, invtype_id, weekly_volume, lastupdate)
+                          SELECT mapregion_id, invtype_id, SUM(quantity), now()
+                          FROM market_data_orderhistory
+                          WHERE mapregion_id = %s AND date >= current_date - interval '7 days'
+                          GROUP BY mapregion_id, invtype_id;""", [region.id, region.id])
+
         # Prevent division by 0
         if not diff.seconds == 0:
             logger.warning("Completed: %s (a: %s / d: %s) at %d items per second." % (region, added, duplicated, ((added + duplicated) / diff.seconds)))
         else:
             logger.warning("Completed: %s (a: %s / d: %s)" % (region, added, duplicated))
+
+
+class RefreshHotBooks(PeriodicTask):
+
+    """
+    Picks the books whose stats the consumers keep in memcache from the request counts of the web tier.
+    Newly admitted books are filled from the DB right away, evicted ones are removed from memcache.
+    """
+
+    run_every = timedelta(minutes=1)
+
+    def run(self, **kwargs):
+        redis_client = get_redis_client()
+        mc = get_memcache_client()
+
+        # Age the request counts and forget the long tail
+        redis_client.zunionstore(HOT_SCORES_KEY, {HOT_SCORES_KEY: HOT_DECAY})
+        redis_client.zremrangebyrank(HOT_SCORES_KEY, 0, -(HOT_TRACKED + 1))
+
+        current = redis_client.smembers(HOT_SET_KEY)
+        ranking = redis_client.zrevrange(HOT_SCORES_KEY, 0, HOT_BOOKS - 1, withscores=True)
+
+        # Books already in the set stay until they drop below half the admission score, so books
+        # close to the threshold do not flap in and out
+        hot = set(book for book, score in ranking
+                  if score >= HOT_MIN_SCORE or (book in current and score >= HOT_MIN_SCORE / 2.0))
+
+        admitted = hot - current
+        evicted = current - hot
+
+        if admitted:
+            books = [[int(id) for id in book.split('-')] for book in admitted]
+            stats = {}
+
+            for region_id in set(book[0] for book in books):
+                type_ids = [book[1] for book in books if book[0] == region_id]
+
+                for stat in ItemRegionStat.objects.filter(mapregion_id=region_id,
+                                                          invtype_id__in=type_ids).values('invtype_id', *HOT_STATS_FIELDS):
+                    stats["%s%s-%s" % (HOT_STATS_KEY, region_id, stat.pop('invtype_id'))] = ujson.dumps(stat)
+
+            mc.set_multi(stats, time=86400)
+
+        if evicted:
+            mc.delete_multi([HOT_STATS_KEY + book for book in evicted])
+
+        # Swap the set and read the metrics of the last interval atomically
+        pipe = redis_client.pipeline()
+        pipe.delete(HOT_SET_KEY)
+
+        if hot:
+            pipe.sadd(HOT_SET_KEY, *hot)
+
+        pipe.hgetall(HOT_METRICS_KEY)
+        pipe.delete(HOT_METRICS_KEY)
+        metrics = pipe.execute()[-2]
+
+        hits = int(metrics.get('hits', 0))
+        misses = int(metrics.get('misses', 0))
+
+        logger.info("Hot books: %d (+%d / -%d), hit rate %.1f%% (h: %d / m: %d)."
+                    % (len(hot), len(admitted), len(evicted),
+                       100.0 * hits / (hits + misses) if hits + misses else 0, hits, misses))
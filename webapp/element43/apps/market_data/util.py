@@ -1,5 +1,40 @@
+# Util
+import time
+import ujson
+import redis
+
 # Models
 from eve_db.models import InvMarketGroup
+from apps.market_data.models import ItemRegionStat
+
+# Reports
+from apps.common.cache import get_or_compute
+from apps.market_data.sql import bid_ask_spread
+
+# Memcache key prefix of the per-station order book version counter, bumped by the dequeuer
+STATION_VERSION_KEY = "e43-station-version-"
+
+# Memcache key prefix of the per-region/type order book version counter, bumped by the dequeuer
+BOOK_VERSION_KEY = "e43-book-version-"
+
+# Memcache key prefix of the stats of hot books (<region>-<type>), kept up to date by the consumers
+HOT_STATS_KEY = "e43-stats-"
+
+# Columns of ItemRegionStat cached for hot books
+HOT_STATS_FIELDS = ('buymean', 'buyavg', 'buymedian', 'buy_std_dev', 'buy_95_percentile', 'buyvolume',
+                    'sellmean', 'sellavg', 'sellmedian', 'sell_std_dev', 'sell_95_percentile', 'sellvolume')
+
+# Redis sorted set of decayed request counts by book (<region>-<type>)
+HOT_SCORES_KEY = "e43-hot-scores"
+
+# Redis set of the books whose stats the consumers push into memcache
+HOT_SET_KEY = "e43-hot-set"
+
+# Redis hash counting hot stats cache hits and misses since the last refresh of the hot set
+HOT_METRICS_KEY = "e43-hot-metrics"
+
+# Memcache key prefix of the UNIX timestamp of the last order ingest per region (or "all"), set by the dequeuer
+REGION_INGEST_KEY = "e43-region-ingest-"
 
 
 def group_breadcrumbs(groupid):
@@ -42,3 +77,119 @@ def group_ids(groupid):
             generating = False
 
     return reversed(breadcrumbs)
+
+
+def cache_version(mc, key):
+    """
+    Returns the version counter stored in memcache under key.
+    If memcache lost the counter it is re-seeded with the current timestamp,
+    so previously used versions never come back.
+    """
+    version = mc.get(key)
+
+    if version is None:
+        mc.add(key, int(time.time()))
+        version = mc.get(key)
+
+    return version
+
+
+def station_version(mc, station_id):
+    """
+    Returns the current order book version of a station.
+    """
+    return cache_version(mc, STATION_VERSION_KEY + str(station_id))
+
+
+def book_versions(mc, books):
+    """
+    Returns a dict mapping (type_id, region_id) tuples to the current version of their order book.
+    Fetches all counters with a single multi-get and re-seeds the ones memcache lost.
+    """
+    keys = dict((book, "%s%s-%s" % (BOOK_VERSION_KEY, book[1], book[0])) for book in books)
+    versions = mc.get_multi(keys.values())
+
+    missing = dict((key, int(time.time())) for key in keys.values() if key not in versions)
+
+    if missing:
+        # Another process may have seeded some of them in the meantime
+        failed = mc.add_multi(missing)
+        versions.update(missing)
+        versions.update(mc.get_multi(failed))
+
+    return dict((book, versions.get(key)) for book, key in keys.items())
+
+
+def station_trading_report(mc, station_id, region_id, market_group_id,
+                           order_by='potential_daily_profit', page=1, per_page=100):
+    """
+    Returns a page of the bid/ask spread report of a market group in a station.
+    Pages are cached until the station's order book changes.
+    """
+    cache_key = "e43-spread-report-%s-%s-%s-%s-%s-%s" % (station_id, market_group_id, order_by, page, per_page,
+                                                           station_version(mc, station_id))
+
+    # Weekly volumes change without touching the book - expire after an hour
+    return get_or_compute(mc, cache_key, lambda: bid_ask_spread(station_id, region_id, market_group_id,
+                                                                order_by, per_page, (page - 1) * per_page),
+                          timeout=3600)
+
+
+def last_ingest(mc, region_id=None):
+    """
+    Returns the UNIX timestamp of the last order ingest into a region, or into any region if none is given.
+    Returns None if memcache does not know it.
+    """
+    return mc.get(REGION_INGEST_KEY + (str(region_id) if region_id else "all"))
+
+
+def hot_stats(mc, redis_client, region_id, type_ids):
+    """
+    Returns a dict mapping type IDs to the cached stats (HOT_STATS_FIELDS) of the hot books among the requested ones.
+    Types missing from the result have to be read from the DB.
+    Every request counts towards the hotness of the book and is recorded as cache hit or miss.
+    """
+    keys = dict((type_id, "%s%s-%s" % (HOT_STATS_KEY, region_id, type_id)) for type_id in type_ids)
+    cached = mc.get_multi(keys.values())
+
+    stats = {}
+
+    for type_id, key in keys.items():
+        if key in cached:
+            stat = ujson.loads(cached[key])
+
+            # Entries lacking fields (written by older consumers) are read from the DB like misses
+            if all(field in stat for field in HOT_STATS_FIELDS):
+                stats[type_id] = stat
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+
+        for type_id in type_ids:
+            pipe.zincrby(HOT_SCORES_KEY, "%s-%s" % (region_id, type_id), 1)
+
+        pipe.hincrby(HOT_METRICS_KEY, 'hits', len(stats))
+        pipe.hincrby(HOT_METRICS_KEY, 'misses', len(keys) - len(stats))
+        pipe.execute()
+    except redis.RedisError:
+        # Tracking is best-effort, the stats are served anyway
+        pass
+
+    return stats
+
+
+def region_stats(mc, redis_client, region_id, type_ids):
+    """
+    Returns a dict mapping type IDs to their stats (HOT_STATS_FIELDS) in a region.
+    Hot books are served from memcache, all others are read from the DB with a single query.
+    Types without stats are left out.
+    """
+    stats = hot_stats(mc, redis_client, region_id, type_ids)
+    missing = [type_id for type_id in type_ids if type_id not in stats]
+
+    if missing:
+        for stat in ItemRegionStat.objects.filter(mapregion_id=region_id,
+                                                  invtype_id__in=missing).values('invtype_id', *HOT_STATS_FIELDS):
+            stats[stat.pop('invtype_id')] = stat
+
+    return stats
@@ -4,23 +4,44 @@ from django.template import RequestContext
 from django.http import HttpResponseRedirect
 from django.core.urlresolvers import reverse
 from django.contrib import messages
+from django.conf import settings
+
+# Util
+from random import sample
+
+# Caching
+from apps.common.cache import get_or_compute
+from apps.common.util import get_memcache_client
 
 # market_data models
-from apps.market_data.models import Orders
+from apps.market_data.models import ItemRegionFreshness
 
 # eve_db models
 from eve_db.models import InvType
 from eve_db.models import MapRegion
 
+# The list of marketable types only changes with the SDE, so it is cached per SDE version
+MARKETABLE_TYPES_TIMEOUT = 86400
+
+
+def marketable_type_ids():
+    """
+    Returns the IDs of all published types which can be traded on the market.
+    """
+
+    return list(InvType.objects.filter(is_published=True, market_group__isnull=False).values_list('id', flat=True))
+
 
 def random(request):
     """
     Pick 25 random types and scan them.
     """
 
-    # Get 25 random types from DB
-    types = []
-    types += InvType.objects.filter(is_published=True, market_group__isnull=False).order_by('?')[:25]
+    # Sample 25 IDs from the cached list instead of sorting the whole type table randomly
+    type_ids = get_or_compute(get_memcache_client(), "e43-marketable-types-%s" % settings.SDE_VERSION,
+                              marketable_type_ids, timeout=MARKETABLE_TYPES_TIMEOUT)
+
+    types = InvType.objects.in_bulk(sample(type_ids, min(25, len(type_ids)))).values()
 
     rcontext = RequestContext(request, {'types': types})
 
@@ -37,8 +58,8 @@ def region(request):
 
             region = MapRegion.objects.get(id=request.META['HTTP_EVE_REGIONID'])
 
-            # Get all orders in this region ordered by age
-            type_ids = Orders.active.filter(mapregion=region).order_by('generated_at').values_list('invtype_id', flat=True).distinct()[:50]
+            # Get the types with the stalest books in this region from the freshness index
+            type_ids = ItemRegionFreshness.objects.filter(mapregion=region).order_by('generated_at').values_list('invtype_id', flat=True)[:50]
 
             types = InvType.objects.filter(id__in=list(type_ids))
 
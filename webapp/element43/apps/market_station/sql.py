@@ -2,43 +2,75 @@ from django.db import connection
 from apps.common.util import dictfetchall
 
 
-def group_volume(station_id=60008694):
+def station_spreads(station_id=60003760, market_group_id=1413):
 
     """
-    Returns the total/ask/bid ISK volume by market group in a
-    given station in descending order.
+    Returns best ask/bid for every type of a market group in
+    a given station using a single grouped query.
+    Types without orders on one side have NULL for that side.
     """
 
     cursor = connection.cursor()
-    params = [station_id]
+    params = [station_id, market_group_id]
 
-    query = """ SELECT market_group_id,
-                    SUM (total) AS group_total,
-                    SUM (total_bid) AS group_total_bid,
-                    SUM (total_ask) AS group_total_ask
+    query = """ SELECT
+                    eve_db_invtype.id AS invtype_id,
+                    MIN (CASE WHEN market_data_orders.is_bid = FALSE THEN market_data_orders.price END) AS ask,
+                    MAX (CASE WHEN market_data_orders.is_bid = TRUE THEN market_data_orders.price END) AS bid
+                FROM
+                    eve_db_invtype
+                LEFT OUTER JOIN market_data_orders ON (
+                    market_data_orders.invtype_id = eve_db_invtype.id
+                    AND market_data_orders.is_active = TRUE
+                    AND market_data_orders.stastation_id = %s
+                    AND market_data_orders.minimum_volume = 1
+                )
+                WHERE
+                    eve_db_invtype.market_group_id = %s
+                GROUP BY
+                    eve_db_invtype.id;"""
+
+    # Data retrieval operation - no commit required
+    cursor.execute(query, params)
+
+    return dictfetchall(cursor)
+
+
+def station_group_volumes(station_ids, limit=10):
+
+    """
+    Returns the top total/ask/bid ISK volumes by market group for several
+    stations at once, in descending order per station.
+    Each row also carries the total ISK volume of its station.
+    """
+
+    cursor = connection.cursor()
+    params = [list(station_ids), limit]
+
+    query = """ SELECT stastation_id, market_group_id, group_total, group_total_bid, group_total_ask, station_total
                 FROM (
                     SELECT
-                        invtype_id,
-                        SUM (price * volume_remaining) AS total,
-                        SUM (CASE WHEN is_bid = TRUE THEN price * volume_remaining ELSE 0 END) AS total_bid,
-                        SUM (CASE WHEN is_bid = FALSE THEN price * volume_remaining ELSE 0 END) AS total_ask
+                        market_data_itemstationstat.stastation_id,
+                        eve_db_invtype.market_group_id,
+                        SUM (total) AS group_total,
+                        SUM (total_bid) AS group_total_bid,
+                        SUM (total_ask) AS group_total_ask,
+                        SUM (SUM (total)) OVER (PARTITION BY market_data_itemstationstat.stastation_id) AS station_total,
+                        ROW_NUMBER () OVER (PARTITION BY market_data_itemstationstat.stastation_id
+                                            ORDER BY SUM (total) DESC) AS rank
                     FROM
-                        market_data_orders
+                        market_data_itemstationstat
+                    INNER JOIN eve_db_invtype ON (market_data_itemstationstat.invtype_id = eve_db_invtype.id)
                     WHERE
-                        (
-                            market_data_orders.is_active = TRUE
-                            AND market_data_orders.stastation_id = %s
-                            AND market_data_orders.minimum_volume = 1
-                        )
+                        market_data_itemstationstat.stastation_id = ANY (%s)
                     GROUP BY
-                        invtype_id
-                    ORDER BY
-                        total DESC
-                ) AS "total"
-                INNER JOIN eve_db_invtype ON (invtype_id = eve_db_invtype. ID)
-                GROUP BY
-                    market_group_id
+                        market_data_itemstationstat.stastation_id,
+                        eve_db_invtype.market_group_id
+                ) AS "groups"
+                WHERE
+                    rank <= %s
                 ORDER BY
+                    stastation_id,
                     group_total DESC;"""
 
     # Data retrieval operation - no commit required
@@ -47,35 +79,37 @@ def group_volume(station_id=60008694):
     return dictfetchall(cursor)
 
 
-def type_volume(station_id=60008694):
+def station_type_volumes(station_ids, limit=10):
 
     """
-    Returns the total/ask/bid ISK volume by type in a
-    given station in descending order.
+    Returns the top total/ask/bid ISK volumes by type for several
+    stations at once, in descending order per station.
     """
 
     cursor = connection.cursor()
-    params = [station_id]
+    params = [list(station_ids), limit]
 
-    query = """ SELECT
-                    invtype_id,
-                    SUM (price * volume_remaining) AS total,
-                    SUM (CASE WHEN is_bid = TRUE THEN price * volume_remaining ELSE 0 END) AS total_bid,
-                    SUM (CASE WHEN is_bid = FALSE THEN price * volume_remaining ELSE 0 END) AS total_ask
-                FROM
-                    market_data_orders
+    query = """ SELECT stastation_id, invtype_id, total, total_bid, total_ask
+                FROM (
+                    SELECT
+                        stastation_id,
+                        invtype_id,
+                        total,
+                        total_bid,
+                        total_ask,
+                        ROW_NUMBER () OVER (PARTITION BY stastation_id ORDER BY total DESC) AS rank
+                    FROM
+                        market_data_itemstationstat
+                    WHERE
+                        market_data_itemstationstat.stastation_id = ANY (%s)
+                ) AS "types"
                 WHERE
-                    (
-                        market_data_orders.is_active = TRUE
-                        AND market_data_orders.stastation_id = %s
-                        AND market_data_orders.minimum_volume = 1
-                    )
-                GROUP BY
-                    invtype_id
+                    rank <= %s
                 ORDER BY
+                    stastation_id,
                     total DESC;"""
 
     # Data retrieval operation - no commit required
     cursor.execute(query, params)
 
-    return dictfetchall(cursor)
\ No newline at end of file
+    return dictfetchall(cursor)
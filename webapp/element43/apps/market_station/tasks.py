@@ -0,0 +1,93 @@
+# Util
+import datetime
+import pytz
+
+# Celery
+from celery.task import PeriodicTask
+from celery.utils.log import get_task_logger
+
+# Memcache
+from apps.common.util import get_memcache_client
+
+# Django
+from django.db.models import Count
+
+# Models
+from eve_db.models import StaStation, InvType, InvMarketGroup
+from apps.market_data.models import Orders
+
+# Helper functions
+from apps.market_station.sql import station_group_volumes, station_type_volumes
+
+
+logger = get_task_logger(__name__)
+
+# Memcache key of the precomputed station ranking
+RANKING_KEY = "e43-station-ranking"
+
+
+class BuildStationRanking(PeriodicTask):
+
+    """
+    Precomputes the station ranking so the ranking view only has to read the snapshot from memcache.
+    """
+
+    run_every = datetime.timedelta(minutes=30)
+
+    def run(self, **kwargs):
+
+        mc = get_memcache_client()
+
+        # Only one worker may rebuild at a time - the lock expires on its own if a worker dies
+        if not mc.add(RANKING_KEY + "-lock", True, time=600):
+            logger.warning("Station ranking is already being built.")
+            return
+
+        try:
+            start = datetime.datetime.now()
+
+            # Get top stations by number of orders
+            rank_list = list(Orders.active.values('stastation__id').annotate(ordercount=Count('id')).order_by('-ordercount')[:50])
+            station_ids = [rank['stastation__id'] for rank in rank_list]
+
+            stations = StaStation.objects.select_related('solar_system', 'region', 'type').in_bulk(station_ids)
+
+            # Get ask/bid ISK volumes of all stations by market group and type in descending order
+            volumes_by_group = station_group_volumes(station_ids, 10)
+            volumes_by_type = station_type_volumes(station_ids, 10)
+
+            groups = InvMarketGroup.objects.in_bulk([group['market_group_id'] for group in volumes_by_group if group['market_group_id']])
+            types = InvType.objects.in_bulk([invtype['invtype_id'] for invtype in volumes_by_type])
+
+            for rank in rank_list:
+                rank.update({'station': stations[rank['stastation__id']],
+                             'volume': 0,
+                             'volumes_by_group': [],
+                             'volumes_by_type': []})
+
+            ranks = dict((rank['stastation__id'], rank) for rank in rank_list)
+
+            for group in volumes_by_group:
+                rank = ranks[group.pop('stastation_id')]
+                rank['volume'] = group.pop('station_total')
+
+                # Sometimes invTypes do not have a valid group - add pseudo-group
+                group['group'] = groups.get(group['market_group_id'], {'id': 0, 'name': "No group"})
+
+                rank['volumes_by_group'].append(group)
+
+            for invtype in volumes_by_type:
+                rank = ranks[invtype.pop('stastation_id')]
+                invtype['type'] = types[invtype['invtype_id']]
+
+                rank['volumes_by_type'].append(invtype)
+
+            generated_at = pytz.utc.localize(datetime.datetime.utcnow())
+
+            # Keep the snapshot around for a day, so a stuck worker does not take the page down
+            mc.set(RANKING_KEY, {'rank_list': rank_list, 'generated_at': generated_at}, time=86400)
+
+            logger.info("Built station ranking in %s." % (datetime.datetime.now() - start))
+
+        finally:
+            mc.delete(RANKING_KEY + "-lock")
@@ -12,6 +12,9 @@ urlpatterns = patterns('apps.market_station.views',
     # Trading group browser panel
     url(r'^station/(?P<station_id>[0-9]+)/import/browse/panel/(?P<group_id>[0-9]+)/$', 'station.panel', name='import_panel'),
 
+    # Station trading report of a market group
+    url(r'^station/(?P<station_id>[0-9]+)/report/(?P<group_id>[0-9]+)/$', 'station.trading_report', name='station_trading_report'),
+
     # Import AJAX
     url(r'^station/(?P<station_id>[0-9]+)/import/system/(?P<system_id>[0-9]+)/$', 'station.import_system', name='import_system'),
     url(r'^station/(?P<station_id>[0-9]+)/import/region/(?P<region_id>[0-9]+)/$', 'station.import_region', name='import_region'),
@@ -1,110 +1,49 @@
 # Imports for memcache
 from apps.common.util import get_memcache_client
+from apps.common.cache import get_or_compute
 
 # Util
-import datetime
-import pytz
 import json
 from operator import itemgetter
 
 # Template and context-related imports
 from django.shortcuts import render_to_response
 from django.template import RequestContext
-from django.db.models import Count
 from django.http import HttpResponse
 
 # eve_db models
-from eve_db.models import StaStation, MapRegion, MapSolarSystem, InvType, InvMarketGroup
-
-# Models
-from apps.market_data.models import Orders, OrderHistory
+from eve_db.models import StaStation, MapRegion, MapSolarSystem, InvType
 
 # Helper functions
 from apps.market_data.sql import import_markup
-from apps.market_station.sql import group_volume, type_volume
+from apps.market_station.sql import station_spreads
+from apps.market_station.tasks import RANKING_KEY
+from apps.market_data.util import station_version, station_trading_report
 from apps.common.util import find_path
-from django.db.models import Sum, Min, Max
+from apps.common.search import search as search_index
+
+# Rows per page of the station trading report
+REPORT_PAGE_SIZE = 100
+
+# Maximum number of results of the import search and its live search
+SEARCH_LIMIT = 100
+LIVE_SEARCH_LIMIT = 15
 
 
-# Caches this view 1 hour long
 def ranking(request, group=0):
 
     """
-    This function generates the station ranks based on active orders in the DB
+    This function shows the station ranks based on active orders in the DB.
+    The ranking itself is precomputed by the BuildStationRanking task.
     """
 
     # Connect to memcache
     mc = get_memcache_client()
 
-    # Check if we already have a stored copy
-    if (mc.get("e43-station-ranking") is not None):
-
-        # Get values from mc if existent
-        ranking = mc.get("e43-station-ranking")
-        rank_list = ranking['rank_list']
-        generated_at = ranking['generated_at']
-
-    else:
-        #
-        # Generate numbers if there is no cached version present in memcache (anymore)
-        #
-
-        # Get top stations by number of orders
-        rank_list = Orders.active.values('stastation__id').annotate(ordercount=Count('id')).order_by('-ordercount')[:50]
-
-        for rank in rank_list:
-
-            # Get station
-            station = StaStation.objects.get(id=rank['stastation__id'])
-
-            #
-            # Get group values
-            #
-
-            # Get ask/bid ISK volumes in that station by marketgroup in descending order
-            volumes_by_group = group_volume(station.id)[:10]
-
-            # Total volume in ISK
-            total_volume = 0
-
-            # Get group objects from DB and calculate total volume
-            for group in volumes_by_group:
-
-                try:
-                    # Get market group
-                    group['group'] = InvMarketGroup.objects.get(id=group['market_group_id'])
-                except InvMarketGroup.DoesNotExist:
-                    # Sometimes invTypes do not have a valid group - add pseudo-group
-                    group['group'] = {}
-                    group['group']['id'] = 0
-                    group['group']['name'] = "No group"
-
-                total_volume += group['group_total']
-
-            #
-            # Get type values
-            #
+    # Get the current snapshot - it is empty until the task ran for the first time
+    ranking = mc.get(RANKING_KEY) or {'rank_list': [], 'generated_at': None}
 
-            # Get ask/bid ISK volumes in that station by marketgroup in descending order
-            volumes_by_type = type_volume(station.id)[:10]
-
-            # Get gtype objects from DB
-            for invType in volumes_by_type:
-                # Get market group
-                invType['type'] = InvType.objects.get(id=invType['invtype_id'])
-
-            rank.update({'station': station,
-                         'volume': total_volume,
-                         'volumes_by_group': volumes_by_group,
-                         'volumes_by_type': volumes_by_type})
-
-
-        generated_at = pytz.utc.localize(datetime.datetime.utcnow())
-
-        # Expire after an hour
-        mc.set("e43-station-ranking", {'rank_list': rank_list, 'generated_at': generated_at}, time=3600)
-
-    rcontext = RequestContext(request, {'rank_list': rank_list, 'generated_at': generated_at})
+    rcontext = RequestContext(request, {'rank_list': ranking['rank_list'], 'generated_at': ranking['generated_at']})
 
     return render_to_response('station/ranking.haml', rcontext)
 
@@ -121,14 +60,17 @@ def search(request):
     else:
         query = ""
 
-    # Only if the string is longer than 2 characters start looking in the DB
+    systems = []
+    regions = []
+
+    # Only if the string is longer than 2 characters start looking for it
     if len(query) > 2:
 
-        # Load published type objects matching the name
-        systems = MapSolarSystem.objects.filter(name__icontains=query)
+        # Find the best matching systems and regions in the search index
+        hits = search_index(query, kinds=('system', 'region'), limit=SEARCH_LIMIT)
 
-        # Load stations
-        regions = MapRegion.objects.filter(name__icontains=query)
+        systems = [{'id': id, 'name': name} for kind, id, name in hits if kind == 'system']
+        regions = [{'id': id, 'name': name} for kind, id, name in hits if kind == 'region']
 
     # Create Context
     rcontext = RequestContext(
@@ -142,7 +84,7 @@ def live_search(request):
 
     """
     This adds a basic live search view to element43.
-    The names in the invTypes table are searched with a case insensitive LIKE query and the result is returned as a JSON array of matching names.
+    Systems and regions are looked up in the in-memory search index and the result is returned as a JSON array of matching names.
     """
 
     if request.GET.get('query'):
@@ -157,22 +99,13 @@ def live_search(request):
     # Default to empty array
     search_json = "{query:'" + query + "', suggestions:[], data:[]}"
 
-    # Only if the string is longer than 2 characters start looking in the DB
+    # Only if the string is longer than 2 characters start looking for it
     if len(query) > 2:
 
-        # Load system objects matching the name
-        systems = MapSolarSystem.objects.filter(name__icontains=query)
-
-        for system in systems:
-            names.append(system.name)
-            ids.append('system_' + str(system.id))
-
-        # Load regions
-        regions = MapRegion.objects.filter(name__icontains=query)
-
-        for region in regions:
-            names.append(region.name)
-            ids.append('region_' + str(region.id))
+        # Best matching systems and regions
+        for kind, id, name in search_index(query, kinds=('system', 'region'), limit=LIVE_SEARCH_LIMIT):
+            names.append(name)
+            ids.append(kind + '_' + str(id))
 
         # Add additional data for Ajax AutoComplete
         search_json = {'query': query, 'suggestions': names, 'data': ids}
@@ -206,37 +139,20 @@ def station(request, station_id=60003760):
     return render_to_response('station/station.haml', rcontext)
 
 
-def panel(request, station_id=60003760, group_id=1413):
-
+def group_spreads(station_id, group_id):
     """
-    Shows spread for market group.
+    Returns best ask, best bid and their spread of all types of a market group in a station, widest spread first.
     """
 
-    # The station id of Jita IV/4
-    jita_cnap_id = 60003760
-
-    # Get station object - default to CNAP if something goes wrong
-    try:
-        station = StaStation.objects.get(id=station_id)
-    except:
-        station_id = jita_cnap_id
-        station = StaStation.objects.get(id=station_id)
-
-    types = InvType.objects.filter(market_group_id=group_id)
+    types = dict((invtype.id, invtype) for invtype in InvType.objects.filter(market_group_id=group_id))
 
     spreads = []
 
-    for invtype in types:
-
-        ask = Orders.active.filter(stastation_id=station_id,
-                                   minimum_volume=1,
-                                   invtype_id=invtype.id,
-                                   is_bid=False).aggregate(Min('price'))['price__min']
+    # Get best ask/bid of all types in that group at once
+    for row in station_spreads(station_id, group_id):
 
-        bid = Orders.active.filter(stastation_id=station_id,
-                                   minimum_volume=1,
-                                   invtype_id=invtype.id,
-                                   is_bid=True).aggregate(Max('price'))['price__max']
+        ask = row['ask']
+        bid = row['bid']
 
         if ask is None or bid is None:
             spread = None
@@ -244,7 +160,7 @@ def panel(request, station_id=60003760, group_id=1413):
             spread = (ask / bid) * 100
 
         spread = {
-            'type': invtype,
+            'type': types[row['invtype_id']],
             'ask': ask,
             'bid': bid,
             'spread': spread
@@ -254,67 +170,131 @@ def panel(request, station_id=60003760, group_id=1413):
 
     sorted_spreads = sorted(spreads, key=lambda k: k['spread'])
     sorted_spreads.reverse()
-    spreads = sorted_spreads
+
+    return sorted_spreads
+
+
+def panel(request, station_id=60003760, group_id=1413):
+
+    """
+    Shows spread for market group.
+    """
+
+    # The station id of Jita IV/4
+    jita_cnap_id = 60003760
+
+    # Get station object - default to CNAP if something goes wrong
+    try:
+        station = StaStation.objects.get(id=station_id)
+    except:
+        station_id = jita_cnap_id
+        station = StaStation.objects.get(id=station_id)
+
+    # Connect to memcache
+    mc = get_memcache_client()
+
+    # Cached spreads are keyed by the station's order book version, which the dequeuer bumps on new orders
+    cache_key = "e43-station-spread-%s-%s-%s" % (station_id, group_id, station_version(mc, station_id))
+
+    # Expire after an hour even if no new orders arrive
+    spreads = get_or_compute(mc, cache_key, lambda: group_spreads(station_id, group_id), timeout=3600)
 
     rcontext = RequestContext(request, {'station': station, 'spreads': spreads})
 
     return render_to_response('station/_panel.haml', rcontext)
 
 
-def import_system(request, station_id=60003760, system_id=30000142):
+def trading_report(request, station_id=60003760, group_id=1413):
 
     """
-    Generates a list like http://goonmetrics.com/importing/
-    Pattern: System -> Station
+    Returns a page of the station trading report of a market group as JSON.
+    Sorted by the 'order_by' GET parameter, paginated by 'page'.
     """
 
-    # Get system, station and markup
-    system = MapSolarSystem.objects.get(id=system_id)
-    station = StaStation.objects.get(id=station_id)
+    # The station id of Jita IV/4
+    jita_cnap_id = 60003760
 
-    # get the path to destination, assume trying for highsec route
-    path = find_path(system_id, station.solar_system_id)
-    numjumps = len(path) - 1 # don't count the start system
+    # Get station object - default to CNAP if something goes wrong
+    try:
+        station = StaStation.objects.get(id=station_id)
+    except:
+        station_id = jita_cnap_id
+        station = StaStation.objects.get(id=station_id)
 
-    # Mapping: (invTyeID, invTypeName, foreign_ask, local_bid, markup, invTyeID)
-    markup = import_markup(station_id, 0, system_id, 0)
+    order_by = request.GET.get('order_by', 'potential_daily_profit')
+
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    # Connect to memcache
+    mc = get_memcache_client()
+
+    # Pages are cached per station and group until the station's order book changes
+    rows = station_trading_report(mc, station.id, station.region_id, group_id, order_by, page, REPORT_PAGE_SIZE)
+
+    # Prices and volumes come back as decimals
+    report = []
+
+    for row in rows:
+        item = {'id': row['id'], 'name': row['name']}
+
+        for column in ('min_ask', 'max_bid', 'spread', 'spread_percent', 'weekly_volume', 'potential_daily_profit'):
+            item[column] = float(row[column])
+
+        report.append(item)
+
+    serialized = json.dumps({'page': page, 'order_by': order_by, 'report': report})
+
+    # Return JSON without using any template
+    return HttpResponse(serialized, content_type='application/json')
+
+
+def potential_profits(markup):
+
+    """
+    Adds potential profit ((local_bid - foreign_ask) * weekly_volume) to all markup rows with a
+    weekly volume and returns those sorted by potential profit in descending order.
+    """
 
-    # Get last week for history query
-    last_week = pytz.utc.localize(
-        datetime.datetime.utcnow() - datetime.timedelta(days=7))
     data = []
 
     for point in markup:
-        # Add new values to dict and if there's a weekly volume append it to list
-        new_values = {
-            # Get local weekly volume for that item
-            'weekly_volume': OrderHistory.objects.filter(mapregion_id=station.region.id,
-                                                                 invtype_id=point['id'],
-                                                                 date__gte=last_week)
-            .aggregate(Sum("quantity"))['quantity__sum'],
-
-            # Get filtered local bid qty
-            'bid_qty_filtered': Orders.active.filter(stastation_id=station_id,
-                                                      invtype_id=point['id'], is_bid=True,
-                                                      minimum_volume=1,
-                                                      price__gte=(point['local_bid'] - (point['local_bid'] * 0.01)))
-            .aggregate(Sum("volume_remaining"))['volume_remaining__sum'],
-
-            # Get filtered ask qty of the other system
-            'ask_qty_filtered': Orders.active.filter(mapsolarsystem_id=system_id,
-                                                      invtype_id=point['id'], is_bid=False,
-                                                      minimum_volume=1,
-                                                      price__lte=(point['foreign_ask'] + (point['foreign_ask'] * 0.01)))
-            .aggregate(Sum("volume_remaining"))['volume_remaining__sum']}
-        point.update(new_values)
-
-        # Calculate potential profit ((local_bid - foreign_ask) * weekly_volume)
         if point['weekly_volume'] is not None:
             point['potential_profit'] = ((point['local_bid'] - point['foreign_ask']) * point['weekly_volume'])
             data.append(point)
 
     data.sort(key=itemgetter('potential_profit'), reverse=True)
 
+    return data
+
+
+def import_system(request, station_id=60003760, system_id=30000142):
+
+    """
+    Generates a list like http://goonmetrics.com/importing/
+    Pattern: System -> Station
+    """
+
+    # Get system, station and markup
+    system = MapSolarSystem.objects.get(id=system_id)
+    station = StaStation.objects.get(id=station_id)
+
+    # get the path to destination, assume trying for highsec route
+    try:
+        path = find_path(system_id, station.solar_system_id)
+        numjumps = len(path) - 1 # don't count the start system
+    except IOError:
+        # Pathfinder is down or too slow - show the markup without a route
+        path = []
+        numjumps = None
+
+    # Mapping: (id, name, foreign_ask, local_bid, markup, weekly_volume, bid_qty_filtered, ask_qty_filtered)
+    markup = import_markup(station_id, 0, system_id, 0)
+
+    data = potential_profits(markup)
+
     rcontext = RequestContext(request, {'system': system, 'markup':
                               data, 'path': path, 'jumps': numjumps})
 
@@ -328,47 +308,11 @@ def import_region(request, station_id=60003760, region_id=10000002):
     Pattern: Region -> Station
     """
 
-    # Get region, station and markup
+    # Get region and markup
     region = MapRegion.objects.get(id=region_id)
-    station = StaStation.objects.get(id=station_id)
     markup = import_markup(station_id, region_id, 0, 0)
 
-    # Get last week for history query
-    last_week = pytz.utc.localize(
-        datetime.datetime.utcnow() - datetime.timedelta(days=7))
-
-    data = []
-
-    for point in markup:
-    # Add new values to dict and if there's a weekly volume append it to list
-        new_values = {
-            # Get local weekly volume for that item
-            'weekly_volume': OrderHistory.objects.filter(mapregion_id=station.region.id,
-                                                         invtype_id=point['id'],
-                                                         date__gte=last_week)
-            .aggregate(Sum("quantity"))['quantity__sum'],
-
-            # Get filtered local bid qty
-            'bid_qty_filtered': Orders.active.filter(stastation_id=station_id,
-                                                      invtype_id=point['id'], is_bid=True,
-                                                      minimum_volume=1,
-                                                      price__gte=(point['local_bid'] - (point['local_bid'] * 0.01)))
-            .aggregate(Sum("volume_remaining"))['volume_remaining__sum'],
-
-            # Get filtered ask qty of the other region
-            'ask_qty_filtered': Orders.active.filter(mapregion_id=region_id,
-                                                      invtype_id=point['id'], is_bid=False,
-                                                      minimum_volume=1,
-                                                      price__lte=(point['foreign_ask'] + (point['foreign_ask'] * 0.01)))
-            .aggregate(Sum("volume_remaining"))['volume_remaining__sum']}
-        point.update(new_values)
-
-        # Calculate potential profit ((foreign_ask - local_bid) * weekly_volume)
-        if point['weekly_volume'] is not None:
-            point['potential_profit'] = ((point['local_bid'] - point['foreign_ask']) * point['weekly_volume'])
-            data.append(point)
-
-    data.sort(key=itemgetter('potential_profit'), reverse=True)
+    data = potential_profits(markup)
 
     rcontext = RequestContext(request, {'region': region, 'markup': data})
 
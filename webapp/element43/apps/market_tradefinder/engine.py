@@ -0,0 +1,132 @@
+"""
+Route-aware trade finder.
+
+Candidates are scored by the profit of one trip per jump between the best ask and the best bid.
+A trip buys the cheapest asks and sells to the highest bids for as long as that is profitable and
+the cargo hold has room, so profit per m3 decides the trip profit of everything that fills the hold.
+"""
+
+# Util
+import numpy as np
+
+# Helper functions
+from apps.common.util import find_jumps
+from apps.market_tradefinder.sql import trade_candidates
+
+# Cargo capacity of a hauler in m3, limits the quantity of one trip
+CARGO_CAPACITY = 10000
+
+
+def route_jumps(candidates):
+    """
+    Returns the number of jumps between ask and bid system of every candidate, NaN if there is no route.
+    Asks a pathfinder once per distinct ask system and stops asking once it fails.
+    """
+
+    # Group bid systems by ask system
+    routes = {}
+
+    for candidate in candidates:
+        routes.setdefault(candidate['ask_system_id'], set()).add(candidate['bid_system_id'])
+
+    lengths = {}
+
+    for ask_system, bid_systems in routes.items():
+        try:
+            for bid_system, jumps in find_jumps(ask_system, bid_systems).items():
+                lengths[(ask_system, bid_system)] = jumps
+        except IOError:
+            # Pathfinder is down or too slow - the remaining routes stay unknown rather than waiting for each
+            break
+
+    return np.array([lengths.get((candidate['ask_system_id'], candidate['bid_system_id']), np.nan)
+                     for candidate in candidates], dtype=float)
+
+
+def fill(ask_prices, ask_volumes, bid_prices, bid_volumes, max_quantity):
+    """
+    Walks both price ladders (best price first) and returns the quantity and profit of buying the cheapest asks
+    and selling them to the highest bids, unit by unit while that makes a profit, up to max_quantity units.
+    """
+
+    ask_edges = np.cumsum(np.asarray(ask_volumes, dtype=float))
+    bid_edges = np.cumsum(np.asarray(bid_volumes, dtype=float))
+
+    # Split the traded quantity into segments in which both the ask and the bid price stay the same
+    limit = min(ask_edges[-1], bid_edges[-1], max_quantity)
+    edges = np.union1d(ask_edges[ask_edges < limit], bid_edges[bid_edges < limit])
+    edges = np.append(edges, limit)
+    lengths = np.diff(np.concatenate(([0.0], edges)))
+
+    # The order filling the end of a segment fills all of it
+    margins = (np.asarray(bid_prices, dtype=float)[np.searchsorted(bid_edges, edges)] -
+               np.asarray(ask_prices, dtype=float)[np.searchsorted(ask_edges, edges)])
+
+    # Ask prices rise and bid prices fall along the ladders, so all profitable segments come first
+    profitable = margins > 0
+
+    return lengths[profitable].sum(), (margins * lengths)[profitable].sum()
+
+
+def find_trades(start_id=10000002, destination_id=10000002, limit=50, cargo=CARGO_CAPACITY):
+    """
+    Returns the best inter-region trades ranked by the profit per jump of one trip with cargo m3 of cargo space.
+    Trades without a known route are ranked last.
+
+    Mapping: (id, name, volume, markup, jumps, quantity, profit, profit_per_jump, profit_per_m3, ...)
+    """
+
+    candidates = trade_candidates(start_id, destination_id)
+
+    if not candidates:
+        return []
+
+    best_ask = np.array([candidate['best_ask'] for candidate in candidates], dtype=float)
+    best_bid = np.array([candidate['best_bid'] for candidate in candidates], dtype=float)
+    volume = np.array([candidate['volume'] for candidate in candidates], dtype=float)
+    jumps = route_jumps(candidates)
+
+    # Some types do not have any volume (e.g. blueprint copies) - the hold never limits those
+    max_quantity = np.where(volume > 0, np.floor(cargo / np.where(volume > 0, volume, 1)), np.inf)
+
+    # One trip can only move what fits into the hold and what both sides of the book can take at a profit
+    trips = np.array([fill(candidate['ask_prices'], candidate['ask_volumes'],
+                           candidate['bid_prices'], candidate['bid_volumes'], max_quantity[index])
+                      for index, candidate in enumerate(candidates)], dtype=float).reshape(-1, 2)
+
+    quantity = trips[:, 0]
+    profit = trips[:, 1]
+    markup = (best_bid / best_ask - 1) * 100
+
+    # Trades within the same system still take one trip
+    profit_per_jump = profit / np.maximum(jumps, 1)
+
+    # Average profit per m3 of the units actually traded
+    cargo_used = quantity * volume
+    profit_per_m3 = np.where(cargo_used > 0, profit / np.where(cargo_used > 0, cargo_used, 1), np.inf)
+
+    # Trades which can't move a single unit (e.g. too big for the hold) are dropped
+    tradeable = np.flatnonzero(quantity > 0)
+
+    # Unknown routes sort last
+    score = np.where(np.isnan(profit_per_jump), -np.inf, profit_per_jump)
+    ranking = tradeable[np.argsort(-score[tradeable], kind='mergesort')][:limit]
+
+    trades = []
+
+    for index in ranking:
+        trade = candidates[index]
+
+        # The ladders are only needed for scoring
+        for key in ('ask_prices', 'ask_volumes', 'bid_prices', 'bid_volumes'):
+            del trade[key]
+
+        trade.update({'markup': float(markup[index]),
+                      'jumps': None if np.isnan(jumps[index]) else int(jumps[index]),
+                      'quantity': int(quantity[index]),
+                      'profit': float(profit[index]),
+                      'profit_per_jump': None if np.isnan(profit_per_jump[index]) else float(profit_per_jump[index]),
+                      'profit_per_m3': None if np.isinf(profit_per_m3[index]) else float(profit_per_m3[index])})
+        trades.append(trade)
+
+    return trades
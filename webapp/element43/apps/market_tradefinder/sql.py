@@ -3,19 +3,26 @@ from django.db import connection
 from apps.common.util import dictfetchall
 
 
-def find_trades(start_id=60008694, destination_id=10000002):
+def trade_candidates(start_id=10000002, destination_id=10000002, limit=500):
 
     """
-    Returns inter-region trade opportunities.
+    Returns inter-region trade candidates with the order book depth to score them.
+    Candidates are preselected by their stats markup, then the best ask in the start region,
+    the best bid in the destination region, the systems of those orders and both sides of the book
+    are looked up in the same query. The book is returned as price ladders (best price first) of all
+    asks below the best bid and all bids above the best ask - no other order can be traded at a profit.
+
+    Mapping: (id, name, volume, best_ask, ask_system_id, ask_prices, ask_volumes,
+              best_bid, bid_system_id, bid_prices, bid_volumes)
     """
 
     cursor = connection.cursor()
-    params = [destination_id, start_id, start_id]
+    params = [destination_id, start_id, limit,
+              start_id, destination_id,
+              start_id, destination_id]
 
-    query = """SELECT *
-                FROM (
-                    SELECT t.id, t.name, t.volume, b.local_ask, a.foreign_bid,
-                           ((a.foreign_bid / b.local_ask) - 1) * 100 AS markup
+    query = """WITH c AS (
+                    SELECT t.id, t.name, t.volume
                     FROM eve_db_invtype t
                         INNER JOIN (SELECT invtype_id, buyavg AS foreign_bid
                                     FROM market_data_itemregionstat
@@ -25,15 +32,87 @@ def find_trades(start_id=60008694, destination_id=10000002):
                                     FROM market_data_itemregionstat
                                     WHERE mapregion_id = %s AND lastupdate > current_date - interval '3 days'
                                     ) b ON (t.id = b.invtype_id AND local_ask > 0)
-                    WHERE t.id IN (SELECT market_data_itemregionstat.invtype_id
-                                   FROM market_data_itemregionstat
-                                   WHERE market_data_itemregionstat.mapregion_id = %s)
+                    WHERE a.foreign_bid > b.local_ask
+                    ORDER BY a.foreign_bid / b.local_ask DESC
+                    LIMIT %s
+               ),
+               asks AS (
+                    SELECT DISTINCT ON (o.invtype_id) o.invtype_id, o.price AS best_ask, o.mapsolarsystem_id AS ask_system_id
+                    FROM market_data_orders o INNER JOIN c ON (o.invtype_id = c.id)
+                    WHERE o.mapregion_id = %s AND o.is_bid = 'f' AND o.is_active = 't' AND o.is_suspicious = 'f' AND o.minimum_volume = 1
+                    ORDER BY o.invtype_id, o.price ASC
+               ),
+               bids AS (
+                    SELECT DISTINCT ON (o.invtype_id) o.invtype_id, o.price AS best_bid, o.mapsolarsystem_id AS bid_system_id
+                    FROM market_data_orders o INNER JOIN c ON (o.invtype_id = c.id)
+                    WHERE o.mapregion_id = %s AND o.is_bid = 't' AND o.is_active = 't' AND o.is_suspicious = 'f' AND o.minimum_volume = 1
+                    ORDER BY o.invtype_id, o.price DESC
+               )
+               SELECT c.id, c.name, c.volume,
+                      asks.best_ask, asks.ask_system_id, ask_depth.ask_prices, ask_depth.ask_volumes,
+                      bids.best_bid, bids.bid_system_id, bid_depth.bid_prices, bid_depth.bid_volumes
+               FROM c
+                    INNER JOIN asks ON (c.id = asks.invtype_id)
+                    INNER JOIN bids ON (c.id = bids.invtype_id AND bids.best_bid > asks.best_ask)
+                    INNER JOIN (SELECT o.invtype_id,
+                                       array_agg(o.price ORDER BY o.price ASC) AS ask_prices,
+                                       array_agg(o.volume_remaining ORDER BY o.price ASC) AS ask_volumes
+                                FROM market_data_orders o INNER JOIN bids ON (o.invtype_id = bids.invtype_id)
+                                WHERE o.mapregion_id = %s AND o.is_bid = 'f' AND o.is_active = 't' AND o.is_suspicious = 'f' AND o.minimum_volume = 1
+                                      AND o.price < bids.best_bid
+                                GROUP BY o.invtype_id) ask_depth ON (c.id = ask_depth.invtype_id)
+                    INNER JOIN (SELECT o.invtype_id,
+                                       array_agg(o.price ORDER BY o.price DESC) AS bid_prices,
+                                       array_agg(o.volume_remaining ORDER BY o.price DESC) AS bid_volumes
+                                FROM market_data_orders o INNER JOIN asks ON (o.invtype_id = asks.invtype_id)
+                                WHERE o.mapregion_id = %s AND o.is_bid = 't' AND o.is_active = 't' AND o.is_suspicious = 'f' AND o.minimum_volume = 1
+                                      AND o.price > asks.best_ask
+                                GROUP BY o.invtype_id) bid_depth ON (c.id = bid_depth.invtype_id);"""
+
+    # Data retrieval operation - no commit required
+    cursor.execute(query, params)
+
+    return dictfetchall(cursor)
+
+
+def top_orders(region_id, type_ids, is_bid, limit=5):
+
+    """
+    Returns the best active orders of several types in a region at once.
+    Sell orders are ranked by ascending, buy orders by descending price.
+    Mapping: {type_id: [order, ...]}, orders are dicts resembling Orders objects with nested station and system.
+    """
+
+    cursor = connection.cursor()
+    params = [region_id, is_bid, list(type_ids), limit]
+
+    query = """SELECT *
+                FROM (
+                    SELECT o.invtype_id, o.price, o.volume_remaining, o.minimum_volume, o.generated_at,
+                           o.stastation_id, s.name AS stastation_name,
+                           o.mapsolarsystem_id, m.security_level,
+                           ROW_NUMBER() OVER (PARTITION BY o.invtype_id
+                                              ORDER BY CASE WHEN o.is_bid THEN -o.price ELSE o.price END) AS rank
+                    FROM market_data_orders o
+                        INNER JOIN eve_db_stastation s ON (o.stastation_id = s.id)
+                        INNER JOIN eve_db_mapsolarsystem m ON (o.mapsolarsystem_id = m.id)
+                    WHERE o.is_active = 't' AND o.mapregion_id = %s AND o.is_bid = %s AND o.invtype_id = ANY (%s)
                 ) q
-                WHERE q.markup > 0
-                ORDER BY q.markup DESC
-                LIMIT 50;"""
+                WHERE q.rank <= %s
+                ORDER BY q.invtype_id, q.rank;"""
 
     # Data retrieval operation - no commit required
     cursor.execute(query, params)
 
-    return dictfetchall(cursor)
\ No newline at end of file
+    orders = {}
+
+    for row in dictfetchall(cursor):
+        orders.setdefault(row['invtype_id'], []).append({
+            'price': row['price'],
+            'volume_remaining': row['volume_remaining'],
+            'minimum_volume': row['minimum_volume'],
+            'generated_at': row['generated_at'],
+            'stastation': {'id': row['stastation_id'], 'name': row['stastation_name']},
+            'mapsolarsystem': {'id': row['mapsolarsystem_id'], 'security_level': row['security_level']}})
+
+    return orders
@@ -9,9 +9,37 @@ from forms import TradefinderForm
 from django.http import HttpResponse
 from eve_db.models import MapRegion
 
-from apps.market_data.models import Orders
+from apps.common.util import get_memcache_client
+from apps.common.cache import get_or_compute
 
-from apps.market_tradefinder.sql import find_trades
+from apps.market_tradefinder.engine import find_trades
+from apps.market_tradefinder.sql import top_orders
+
+
+def annotate_trades(start, destination):
+    """
+    Returns the best trades between two regions along with the top 5 orders on both ends.
+    """
+
+    # Get types worth trading
+    trades = find_trades(start.id, destination.id)
+    annotated_trades = []
+
+    # Load additional data like top 5 orders for all types at once
+    type_ids = [trade['id'] for trade in trades]
+    top_sells = top_orders(start.id, type_ids, False, 5)
+    top_buys = top_orders(destination.id, type_ids, True, 5)
+
+    for trade in trades:
+
+        trade['top_sell'] = top_sells.get(trade['id'], [])
+        trade['top_buy'] = top_buys.get(trade['id'], [])
+
+        # Filter bad orders
+        if len(trade['top_sell']) > 0 and len(trade['top_buy']) > 0:
+            annotated_trades.append(trade)
+
+    return annotated_trades
 
 
 def tradefinder(request):
@@ -29,19 +57,12 @@ def tradefinder(request):
             start = form.cleaned_data.get('start')
             destination = form.cleaned_data.get('destination')
 
-            # Get types worth trading
-            trades = find_trades(start.id, destination.id)
-            annotated_trades = []
-
-            # Load additional data like top 5 orders
-            for trade in trades:
-
-                trade['top_sell'] = Orders.active.filter(mapregion=start, invtype_id=trade['id'], is_bid=False).order_by('price')[:5]
-                trade['top_buy'] = Orders.active.filter(mapregion=destination, invtype_id=trade['id'], is_bid=True).order_by('-price')[:5]
+            # Connect to memcache
+            mc = get_memcache_client()
 
-                # Filter bad orders
-                if len(trade['top_sell']) > 0 and len(trade['top_buy']) > 0:
-                    annotated_trades.append(trade)
+            # Popular hub pairs get searched a lot - keep results for a short while
+            cache_key = "e43-tradefinder-%s-%s" % (start.id, destination.id)
+            annotated_trades = get_or_compute(mc, cache_key, lambda: annotate_trades(start, destination), timeout=120)
 
             rcontext = RequestContext(request, {'trades': annotated_trades, 'start': start, 'destination': destination})
             return render_to_response('tradefind_result.haml', rcontext)
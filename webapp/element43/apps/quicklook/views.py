@@ -17,7 +17,6 @@ from django.db.models import Sum
 
 # market_data models
 from apps.market_data.models import Orders
-from apps.market_data.models import ItemRegionStat
 
 # eve_db models
 from eve_db.models import InvType
@@ -25,8 +24,11 @@ from eve_db.models import InvTypeMaterial
 from eve_db.models import MapRegion
 from eve_db.models import MapSolarSystem
 
+# Memcache and redis
+from apps.common.util import get_memcache_client, get_redis_client
+
 # Helper functions
-from apps.market_data.util import group_breadcrumbs
+from apps.market_data.util import group_breadcrumbs, region_stats
 
 
 def quicklook(request, type_id=34):
@@ -52,27 +54,23 @@ def quicklook(request, type_id=34):
     materials = InvTypeMaterial.objects.values('material_type__name',
                                                'quantity',
                                                'material_type__id').filter(type=type_id)
+
+    # Get jita pricing of all materials at once
+    material_stats = region_stats(get_memcache_client(), get_redis_client(), 10000002,
+                                  [material['material_type__id'] for material in materials])
+
     totalprice = 0
     for material in materials:
-        # Get jita pricing
-        stat_object = ItemRegionStat()
-
-        try:
-            stat_object = ItemRegionStat.objects.get(invtype_id__exact=material['material_type__id'],
-                                                     mapregion_id__exact=10000002)
-        except:
-            stat_object.sellmedian = 0
-        try:
-            stats = ItemRegionStat.objects.get(invtype_id__exact=material['material_type__id'],
-                                               mapregion_id__exact=10000002)
-
-            material['total'] = stats.sell_95_percentile * material['quantity']
-            material['min_price'] = stats.sell_95_percentile
-        except:
+        stats = material_stats.get(material['material_type__id'])
+
+        if stats is not None and stats['sell_95_percentile'] is not None:
+            material['total'] = stats['sell_95_percentile'] * material['quantity']
+            material['min_price'] = stats['sell_95_percentile']
+        else:
             material['total'] = 0
             material['min_price'] = 0
 
-        material['price'] = stat_object.sellmedian
+        material['price'] = stats['sellmedian'] if stats is not None else 0
         totalprice += material['total']
 
     # Fetch top 50 buy/sell orders from DB
@@ -260,26 +258,21 @@ def quicklook_region(request, region_id=10000002, type_id=34):
                                                'quantity',
                                                'material_type__id').filter(type=type_id)
 
+    # Get jita pricing of all materials at once
+    material_stats = region_stats(get_memcache_client(), get_redis_client(), 10000002,
+                                  [material['material_type__id'] for material in materials])
+
     totalprice = 0
     for material in materials:
-        # Get jita pricing
-        stat_object = ItemRegionStat()
-
-        try:
-            stat_object = ItemRegionStat.objects.get(invtype_id__exact=material['material_type__id'],
-                                                     mapregion_id__exact=10000002)
-        except:
-            stat_object.sellmedian = 0
-        try:
-            stats = ItemRegionStat.objects.get(invtype_id__exact=material['material_type__id'],
-                                               mapregion_id__exact=10000002)
-
-            material['total'] = stats.sell_95_percentile * material['quantity']
-            material['min_price'] = stats.sell_95_percentile
-        except:
+        stats = material_stats.get(material['material_type__id'])
+
+        if stats is not None and stats['sell_95_percentile'] is not None:
+            material['total'] = stats['sell_95_percentile'] * material['quantity']
+            material['min_price'] = stats['sell_95_percentile']
+        else:
             material['total'] = 0
             material['min_price'] = 0
-        material['price'] = stat_object.sellmedian
+        material['price'] = stats['sellmedian'] if stats is not None else 0
         # material['total']=min_price['min_price']*material['quantity']
         totalprice += material['total']
 
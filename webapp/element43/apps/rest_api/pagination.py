@@ -0,0 +1,32 @@
+import base64
+
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import CursorPagination
+
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the order ID, so deep pages cost as much as the first one.
+    """
+
+    ordering = 'id'
+    page_size = 100
+
+
+def encode_change_cursor(change_seq):
+    """
+    Returns the opaque change feed cursor of a change sequence number.
+    """
+
+    return base64.urlsafe_b64encode(str(change_seq))
+
+
+def decode_change_cursor(cursor):
+    """
+    Returns the change sequence number of a change feed cursor.
+    """
+
+    try:
+        return int(base64.urlsafe_b64decode(str(cursor)))
+    except (TypeError, ValueError):
+        raise ParseError('Invalid cursor.')
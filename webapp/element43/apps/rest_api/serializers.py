@@ -10,12 +10,34 @@ from eve_db.models.station import *
 from eve_db.models.system import *
 
 
+#
+# Mixins
+#
+
+
+class ProjectionMixin(object):
+    """
+    Limits the output to the comma separated list of fields passed in the request's fields parameter.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ProjectionMixin, self).__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+
+        if request is not None and request.query_params.get('fields'):
+            requested = set(request.query_params['fields'].split(','))
+
+            for name in set(self.fields.keys()) - requested:
+                self.fields.pop(name)
+
+
 #
 # market_data serializers
 #
 
 
-class OrderSerializer(serializers.HyperlinkedModelSerializer):
+class OrderSerializer(ProjectionMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Orders
         exclude = ('uploader_ip_hash', 'message_key')
@@ -13,6 +13,7 @@ router = routers.DefaultRouter()
 router.register(r'order', views.OrderViewSet)
 router.register(r'itemRegionStat', views.ItemRegionStatViewSet)
 router.register(r'orderHistory', views.OrderHistoryViewSet)
+router.register(r'changes', views.ChangeFeedViewSet, base_name='changes')
 
 #
 # eve_db routes
@@ -1,12 +1,97 @@
+import hashlib
+import ujson
+
+from django.conf import settings
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
 from django.utils.datastructures import SortedDict
 
 from rest_framework.views import get_view_name, get_view_description
-from rest_framework import viewsets
+from rest_framework.response import Response
+from rest_framework import status, viewsets
+
+from apps.common.util import get_memcache_client
 
 from apps.market_data.models import Orders, OrderHistory, ItemRegionStat
 
 from apps.rest_api.serializers import *
 from apps.rest_api.filters import *
+from apps.rest_api.pagination import OrderCursorPagination, encode_change_cursor, decode_change_cursor
+
+# Rendered static data larger than this does not fit into a memcache item, so it is not cached
+CACHED_RESPONSE_MAX_SIZE = 1000 * 1000
+
+# Rows per table returned by the change feed by default and at most
+CHANGE_FEED_LIMIT = 1000
+CHANGE_FEED_MAX_LIMIT = 10000
+
+# Seconds a change has to be old before the feed hands it out - longer than any transaction writing orders or stats
+CHANGE_FEED_LAG = 60
+
+
+#
+# Base views
+#
+
+
+class StaticDataViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only viewset for static data, which only changes with the SDE.
+    Rendered pages are cached per SDE version, URL and format, clients may keep them forever.
+    """
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        """
+        Returns the cached rendering of this URL and format or calls handler to build it.
+        Answers matching If-None-Match headers without touching memcache at all.
+        """
+
+        format = request.accepted_renderer.format
+
+        # The browsable API renders the user's session, so it is neither cached nor shared
+        if format == 'api':
+            return handler(request, *args, **kwargs)
+
+        # Hyperlinks contain the host, so the data is cached per absolute URL
+        url = request.build_absolute_uri()
+        etag = '"%s"' % hashlib.md5('%s-%s-%s' % (settings.SDE_VERSION, url, format)).hexdigest()
+
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            mc = get_memcache_client()
+            cache_key = "e43-sde-%s-%s" % (settings.SDE_VERSION, hashlib.md5('%s-%s' % (url, format)).hexdigest())
+
+            cached = mc.get(cache_key)
+
+            if cached is None:
+                response = handler(request, *args, **kwargs)
+
+                # Render right away, so hits skip serializing and rendering
+                response.accepted_renderer = request.accepted_renderer
+                response.accepted_media_type = request.accepted_media_type
+                response.renderer_context = self.get_renderer_context()
+                response.render()
+
+                # Keys contain the SDE version, so there is no need to expire them
+                if len(response.content) <= CACHED_RESPONSE_MAX_SIZE:
+                    mc.set(cache_key, (response['Content-Type'], response.content))
+            else:
+                content_type, content = cached
+                response = HttpResponse(content, content_type=content_type)
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=31536000'
+        patch_vary_headers(response, ('Accept',))
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super(StaticDataViewSet, self).list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super(StaticDataViewSet, self).retrieve, *args, **kwargs)
 
 
 #
@@ -22,6 +107,49 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Orders.active.all()
     serializer_class = OrderSerializer
     filter_class = OrdersFilter
+    pagination_class = OrderCursorPagination
+
+    def get_queryset(self):
+        """
+        Only loads the columns of the fields requested with the fields parameter.
+        """
+
+        queryset = super(OrderViewSet, self).get_queryset()
+
+        if self.request.query_params.get('fields'):
+            requested = self.request.query_params['fields'].split(',')
+            columns = [field.name for field in Orders._meta.fields if field.name in requested]
+
+            # The primary key is always loaded
+            queryset = queryset.only(*columns)
+
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Encodes JSON pages directly, other formats use the default list view.
+        """
+
+        if request.accepted_renderer.format != 'json':
+            return super(OrderViewSet, self).list(request, *args, **kwargs)
+
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+
+        return HttpResponse(self.render_page(page), content_type='application/json')
+
+    def render_page(self, page):
+        """
+        Returns the JSON of a page in the same structure the paginator would return.
+        One serializer is built for the whole page and only represents the rows, which skips the renderer.
+        """
+
+        serializer = self.get_serializer(many=True).child
+
+        rows = [ujson.dumps(serializer.to_representation(order)) for order in page]
+
+        return '{"next":%s,"previous":%s,"results":[%s]}' % (ujson.dumps(self.paginator.get_next_link()),
+                                                              ujson.dumps(self.paginator.get_previous_link()),
+                                                              ','.join(rows))
 
     def metadata(self, request):
         """
@@ -104,6 +232,66 @@ class OrderHistoryViewSet(viewsets.ReadOnlyModelViewSet):
         return ret
 
 
+class ChangeFeedViewSet(viewsets.ViewSet):
+    """
+    API endpoint returning the orders and regional stats changed since the cursor passed in the since parameter.
+
+    Call it without a cursor to get the current one, then keep passing the cursor of the last response.
+    Use limit to change the number of rows per type and mapregion to only follow one region.
+
+    Changes are delivered at least once: rows may be returned more than once, so upsert them by ID.
+    Sequence numbers are taken in write order, not commit order, so changes are only handed out
+    once they are CHANGE_FEED_LAG seconds old and every transaction that took a lower number has committed.
+    """
+
+    def list(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', CHANGE_FEED_LIMIT)), CHANGE_FEED_MAX_LIMIT))
+        except ValueError:
+            limit = CHANGE_FEED_LIMIT
+
+        # Cut off by the database clock, which also stamped the changes
+        settled = ["change_at <= now() - %s * interval '1 second'"]
+
+        orders = Orders.objects.extra(where=settled, params=[CHANGE_FEED_LAG])
+        stats = ItemRegionStat.objects.extra(where=settled, params=[CHANGE_FEED_LAG])
+
+        if request.query_params.get('mapregion'):
+            orders = orders.filter(mapregion=request.query_params['mapregion'])
+            stats = stats.filter(mapregion=request.query_params['mapregion'])
+
+        if 'since' not in request.query_params:
+            # Start at the head of the feed
+            head = max(orders.aggregate(head=Max('change_seq'))['head'],
+                       stats.aggregate(head=Max('change_seq'))['head'])
+
+            return Response(SortedDict([('cursor', encode_change_cursor(head or 0)),
+                                        ('more', False),
+                                        ('orders', []),
+                                        ('stats', [])]))
+
+        since = decode_change_cursor(request.query_params['since'])
+
+        orders = list(orders.filter(change_seq__gt=since).order_by('change_seq')[:limit])
+        stats = list(stats.filter(change_seq__gt=since).order_by('change_seq')[:limit])
+
+        # Full pages may have more rows - never move the cursor past the end of one
+        ends = [rows[-1].change_seq for rows in (orders, stats) if len(rows) == limit]
+
+        if ends:
+            cursor = min(ends)
+        else:
+            cursor = max([since] + [rows[-1].change_seq for rows in (orders, stats) if rows])
+
+        # Hyperlinked serializers need the request
+        context = {'request': request}
+
+        return Response(SortedDict([('cursor', encode_change_cursor(cursor)),
+                                    ('more', bool(ends)),
+                                    ('orders', OrderSerializer(orders, many=True, context=context).data),
+                                    ('stats', ItemRegionStatSerializer(stats, many=True, context=context).data)]))
+
+
 #
 # eve_db views
 #
@@ -111,7 +299,7 @@ class OrderHistoryViewSet(viewsets.ReadOnlyModelViewSet):
 # Character
 
 
-class ChrRaceViewSet(viewsets.ReadOnlyModelViewSet):
+class ChrRaceViewSet(StaticDataViewSet):
     """
     API endpoint that allows ChrRaces to be viewed.
     """
@@ -120,7 +308,7 @@ class ChrRaceViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ChrRaceSerializer
 
 
-class ChrBloodlineViewSet(viewsets.ReadOnlyModelViewSet):
+class ChrBloodlineViewSet(StaticDataViewSet):
     """
     API endpoint that allows ChrBloodlines to be viewed.
     """
@@ -129,7 +317,7 @@ class ChrBloodlineViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ChrBloodlineSerializer
 
 
-class ChrAncestryViewSet(viewsets.ReadOnlyModelViewSet):
+class ChrAncestryViewSet(StaticDataViewSet):
     """
     API endpoint that allows ChrAncestrys to be viewed.
     """
@@ -138,7 +326,7 @@ class ChrAncestryViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ChrAncestrySerializer
 
 
-class ChrFactionViewSet(viewsets.ReadOnlyModelViewSet):
+class ChrFactionViewSet(StaticDataViewSet):
     """
     API endpoint that allows ChrFactions to be viewed.
     """
@@ -149,7 +337,7 @@ class ChrFactionViewSet(viewsets.ReadOnlyModelViewSet):
 # Inventory
 
 
-class InvNameViewSet(viewsets.ReadOnlyModelViewSet):
+class InvNameViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvNames to be viewed.
     """
@@ -158,7 +346,7 @@ class InvNameViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvNameSerializer
 
 
-class InvMarketGroupViewSet(viewsets.ReadOnlyModelViewSet):
+class InvMarketGroupViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvMarketGroups to be viewed.
     """
@@ -167,7 +355,7 @@ class InvMarketGroupViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvMarketGroupSerializer
 
 
-class InvCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class InvCategoryViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvCategorys to be viewed.
     """
@@ -176,7 +364,7 @@ class InvCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvCategorySerializer
 
 
-class InvGroupViewSet(viewsets.ReadOnlyModelViewSet):
+class InvGroupViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvGroups to be viewed.
     """
@@ -185,7 +373,7 @@ class InvGroupViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvGroupSerializer
 
 
-class InvMetaGroupViewSet(viewsets.ReadOnlyModelViewSet):
+class InvMetaGroupViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvMetaGroups to be viewed.
     """
@@ -194,7 +382,7 @@ class InvMetaGroupViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvMetaGroupSerializer
 
 
-class InvTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class InvTypeViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvTypes to be viewed.
     """
@@ -203,7 +391,7 @@ class InvTypeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvTypeSerializer
 
 
-class InvTypeMaterialViewSet(viewsets.ReadOnlyModelViewSet):
+class InvTypeMaterialViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvTypeMaterials to be viewed.
     """
@@ -212,7 +400,7 @@ class InvTypeMaterialViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvTypeMaterialSerializer
 
 
-class InvMetaTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class InvMetaTypeViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvMetaTypes to be viewed.
     """
@@ -221,7 +409,7 @@ class InvMetaTypeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvMetaTypeSerializer
 
 
-class InvFlagViewSet(viewsets.ReadOnlyModelViewSet):
+class InvFlagViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvFlags to be viewed.
     """
@@ -230,7 +418,7 @@ class InvFlagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvFlagSerializer
 
 
-class DgmAttributeCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class DgmAttributeCategoryViewSet(StaticDataViewSet):
     """
     API endpoint that allows DgmAttributeCategorys to be viewed.
     """
@@ -239,7 +427,7 @@ class DgmAttributeCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = DgmAttributeCategorySerializer
 
 
-class DgmAttributeTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class DgmAttributeTypeViewSet(StaticDataViewSet):
     """
     API endpoint that allows DgmAttributeTypes to be viewed.
     """
@@ -248,7 +436,7 @@ class DgmAttributeTypeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = DgmAttributeTypeSerializer
 
 
-class DgmTypeAttributeViewSet(viewsets.ReadOnlyModelViewSet):
+class DgmTypeAttributeViewSet(StaticDataViewSet):
     """
     API endpoint that allows DgmTypeAttributes to be viewed.
     """
@@ -257,7 +445,7 @@ class DgmTypeAttributeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = DgmTypeAttributeSerializer
 
 
-class DgmEffectViewSet(viewsets.ReadOnlyModelViewSet):
+class DgmEffectViewSet(StaticDataViewSet):
     """
     API endpoint that allows DgmEffects to be viewed.
     """
@@ -266,7 +454,7 @@ class DgmEffectViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = DgmEffectSerializer
 
 
-class DgmTypeEffectViewSet(viewsets.ReadOnlyModelViewSet):
+class DgmTypeEffectViewSet(StaticDataViewSet):
     """
     API endpoint that allows DgmTypeEffects to be viewed.
     """
@@ -275,7 +463,7 @@ class DgmTypeEffectViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = DgmTypeEffectSerializer
 
 
-class InvPOSResourcePurposeViewSet(viewsets.ReadOnlyModelViewSet):
+class InvPOSResourcePurposeViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvPOSResourcePurposes to be viewed.
     """
@@ -284,7 +472,7 @@ class InvPOSResourcePurposeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvPOSResourcePurposeSerializer
 
 
-class InvPOSResourceViewSet(viewsets.ReadOnlyModelViewSet):
+class InvPOSResourceViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvPOSResources to be viewed.
     """
@@ -293,7 +481,7 @@ class InvPOSResourceViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvPOSResourceSerializer
 
 
-class InvTypeReactionViewSet(viewsets.ReadOnlyModelViewSet):
+class InvTypeReactionViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvTypeReactions to be viewed.
     """
@@ -302,7 +490,7 @@ class InvTypeReactionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvTypeReactionSerializer
 
 
-class InvContrabandTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class InvContrabandTypeViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvContrabandTypes to be viewed.
     """
@@ -311,7 +499,7 @@ class InvContrabandTypeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvContrabandTypeSerializer
 
 
-class InvItemViewSet(viewsets.ReadOnlyModelViewSet):
+class InvItemViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvItems to be viewed.
     """
@@ -320,7 +508,7 @@ class InvItemViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvItemSerializer
 
 
-class InvPositionViewSet(viewsets.ReadOnlyModelViewSet):
+class InvPositionViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvPositions to be viewed.
     """
@@ -329,7 +517,7 @@ class InvPositionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvPositionSerializer
 
 
-class InvUniqueNameViewSet(viewsets.ReadOnlyModelViewSet):
+class InvUniqueNameViewSet(StaticDataViewSet):
     """
     API endpoint that allows InvUniqueNames to be viewed.
     """
@@ -341,7 +529,7 @@ class InvUniqueNameViewSet(viewsets.ReadOnlyModelViewSet):
 # Map
 
 
-class MapUniverseViewSet(viewsets.ReadOnlyModelViewSet):
+class MapUniverseViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapUniverses to be viewed.
     """
@@ -350,7 +538,7 @@ class MapUniverseViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapUniverseSerializer
 
 
-class MapRegionViewSet(viewsets.ReadOnlyModelViewSet):
+class MapRegionViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapRegions to be viewed.
     """
@@ -359,7 +547,7 @@ class MapRegionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapRegionSerializer
 
 
-class MapRegionJumpViewSet(viewsets.ReadOnlyModelViewSet):
+class MapRegionJumpViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapRegionJumps to be viewed.
     """
@@ -368,7 +556,7 @@ class MapRegionJumpViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapRegionJumpSerializer
 
 
-class MapConstellationViewSet(viewsets.ReadOnlyModelViewSet):
+class MapConstellationViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapConstellations to be viewed.
     """
@@ -377,7 +565,7 @@ class MapConstellationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapConstellationSerializer
 
 
-class MapConstellationJumpViewSet(viewsets.ReadOnlyModelViewSet):
+class MapConstellationJumpViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapConstellationJumps to be viewed.
     """
@@ -386,7 +574,7 @@ class MapConstellationJumpViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapConstellationJumpSerializer
 
 
-class MapSolarSystemViewSet(viewsets.ReadOnlyModelViewSet):
+class MapSolarSystemViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapSolarSystems to be viewed.
     """
@@ -395,7 +583,7 @@ class MapSolarSystemViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapSolarSystemSerializer
 
 
-class MapSolarSystemJumpViewSet(viewsets.ReadOnlyModelViewSet):
+class MapSolarSystemJumpViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapSolarSystemJumps to be viewed.
     """
@@ -404,7 +592,7 @@ class MapSolarSystemJumpViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapSolarSystemJumpSerializer
 
 
-class MapJumpViewSet(viewsets.ReadOnlyModelViewSet):
+class MapJumpViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapJumps to be viewed.
     """
@@ -413,7 +601,7 @@ class MapJumpViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapJumpSerializer
 
 
-class MapCelestialStatisticViewSet(viewsets.ReadOnlyModelViewSet):
+class MapCelestialStatisticViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapCelestialStatistics to be viewed.
     """
@@ -422,7 +610,7 @@ class MapCelestialStatisticViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapCelestialStatisticSerializer
 
 
-class MapDenormalizeViewSet(viewsets.ReadOnlyModelViewSet):
+class MapDenormalizeViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapDenormalizes to be viewed.
     """
@@ -431,7 +619,7 @@ class MapDenormalizeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapDenormalizeSerializer
 
 
-class MapLandmarkViewSet(viewsets.ReadOnlyModelViewSet):
+class MapLandmarkViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapLandmarks to be viewed.
     """
@@ -440,7 +628,7 @@ class MapLandmarkViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapLandmarkSerializer
 
 
-class MapLocationSceneViewSet(viewsets.ReadOnlyModelViewSet):
+class MapLocationSceneViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapLocationScenes to be viewed.
     """
@@ -449,7 +637,7 @@ class MapLocationSceneViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapLocationSceneSerializer
 
 
-class MapLocationWormholeClassViewSet(viewsets.ReadOnlyModelViewSet):
+class MapLocationWormholeClassViewSet(StaticDataViewSet):
     """
     API endpoint that allows MapLocationWormholeClasses to be viewed.
     """
@@ -458,7 +646,7 @@ class MapLocationWormholeClassViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MapLocationWormholeClassSerializer
 
 
-class WarCombatZoneViewSet(viewsets.ReadOnlyModelViewSet):
+class WarCombatZoneViewSet(StaticDataViewSet):
     """
     API endpoint that allows WarCombatZones to be viewed.
     """
@@ -467,7 +655,7 @@ class WarCombatZoneViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = WarCombatZoneSerializer
 
 
-class WarCombatZoneSystemViewSet(viewsets.ReadOnlyModelViewSet):
+class WarCombatZoneSystemViewSet(StaticDataViewSet):
     """
     API endpoint that allows WarCombatZoneSystems to be viewed.
     """
@@ -479,7 +667,7 @@ class WarCombatZoneSystemViewSet(viewsets.ReadOnlyModelViewSet):
 # NPC
 
 
-class CrpActivityViewSet(viewsets.ReadOnlyModelViewSet):
+class CrpActivityViewSet(StaticDataViewSet):
     """
     API endpoint that allows CrpActivitys to be viewed.
     """
@@ -488,7 +676,7 @@ class CrpActivityViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CrpActivitySerializer
 
 
-class CrpNPCCorporationViewSet(viewsets.ReadOnlyModelViewSet):
+class CrpNPCCorporationViewSet(StaticDataViewSet):
     """
     API endpoint that allows CrpNPCCorporations to be viewed.
     """
@@ -497,7 +685,7 @@ class CrpNPCCorporationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CrpNPCCorporationSerializer
 
 
-class CrpNPCCorporationDivisionViewSet(viewsets.ReadOnlyModelViewSet):
+class CrpNPCCorporationDivisionViewSet(StaticDataViewSet):
     """
     API endpoint that allows CrpNPCCorporationDivisions to be viewed.
     """
@@ -506,7 +694,7 @@ class CrpNPCCorporationDivisionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CrpNPCCorporationDivisionSerializer
 
 
-class CrpNPCDivisionViewSet(viewsets.ReadOnlyModelViewSet):
+class CrpNPCDivisionViewSet(StaticDataViewSet):
     """
     API endpoint that allows CrpNPCDivisions to be viewed.
     """
@@ -515,7 +703,7 @@ class CrpNPCDivisionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CrpNPCDivisionSerializer
 
 
-class CrpNPCCorporationTradeViewSet(viewsets.ReadOnlyModelViewSet):
+class CrpNPCCorporationTradeViewSet(StaticDataViewSet):
     """
     API endpoint that allows CrpNPCCorporationTrades to be viewed.
     """
@@ -524,7 +712,7 @@ class CrpNPCCorporationTradeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CrpNPCCorporationTradeSerializer
 
 
-class CrpNPCCorporationResearchFieldViewSet(viewsets.ReadOnlyModelViewSet):
+class CrpNPCCorporationResearchFieldViewSet(StaticDataViewSet):
     """
     API endpoint that allows CrpNPCCorporationResearchFields to be viewed.
     """
@@ -533,7 +721,7 @@ class CrpNPCCorporationResearchFieldViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CrpNPCCorporationResearchFieldSerializer
 
 
-class AgtAgentViewSet(viewsets.ReadOnlyModelViewSet):
+class AgtAgentViewSet(StaticDataViewSet):
     """
     API endpoint that allows AgtAgents to be viewed.
     """
@@ -542,7 +730,7 @@ class AgtAgentViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = AgtAgentSerializer
 
 
-class AgtAgentTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class AgtAgentTypeViewSet(StaticDataViewSet):
     """
     API endpoint that allows AgtAgentTypes to be viewed.
     """
@@ -551,7 +739,7 @@ class AgtAgentTypeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = AgtAgentTypeSerializer
 
 
-class AgtResearchAgentViewSet(viewsets.ReadOnlyModelViewSet):
+class AgtResearchAgentViewSet(StaticDataViewSet):
     """
     API endpoint that allows AgtResearchAgents to be viewed.
     """
@@ -563,7 +751,7 @@ class AgtResearchAgentViewSet(viewsets.ReadOnlyModelViewSet):
 # Planet
 
 
-class PlanetSchematicViewSet(viewsets.ReadOnlyModelViewSet):
+class PlanetSchematicViewSet(StaticDataViewSet):
     """
     API endpoint that allows PlanetSchematics to be viewed.
     """
@@ -572,7 +760,7 @@ class PlanetSchematicViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = PlanetSchematicSerializer
 
 
-class PlanetSchematicsPinMapViewSet(viewsets.ReadOnlyModelViewSet):
+class PlanetSchematicsPinMapViewSet(StaticDataViewSet):
     """
     API endpoint that allows PlanetSchematicsPinMaps to be viewed.
     """
@@ -581,7 +769,7 @@ class PlanetSchematicsPinMapViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = PlanetSchematicsPinMapSerializer
 
 
-class PlanetSchematicsTypeMapViewSet(viewsets.ReadOnlyModelViewSet):
+class PlanetSchematicsTypeMapViewSet(StaticDataViewSet):
     """
     API endpoint that allows PlanetSchematicsTypeMaps to be viewed.
     """
@@ -593,7 +781,7 @@ class PlanetSchematicsTypeMapViewSet(viewsets.ReadOnlyModelViewSet):
 # Station
 
 
-class RamActivityViewSet(viewsets.ReadOnlyModelViewSet):
+class RamActivityViewSet(StaticDataViewSet):
     """
     API endpoint that allows RamActivities to be viewed.
     """
@@ -602,7 +790,7 @@ class RamActivityViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = RamActivitySerializer
 
 
-class RamAssemblyLineTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class RamAssemblyLineTypeViewSet(StaticDataViewSet):
     """
     API endpoint that allows RamAssemblyLineTypes to be viewed.
     """
@@ -611,7 +799,7 @@ class RamAssemblyLineTypeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = RamAssemblyLineTypeSerializer
 
 
-class RamAssemblyLineTypeDetailPerCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class RamAssemblyLineTypeDetailPerCategoryViewSet(StaticDataViewSet):
     """
     API endpoint that allows RamAssemblyLineTypeDetailPerCategories to be viewed.
     """
@@ -620,7 +808,7 @@ class RamAssemblyLineTypeDetailPerCategoryViewSet(viewsets.ReadOnlyModelViewSet)
     serializer_class = RamAssemblyLineTypeDetailPerCategorySerializer
 
 
-class RamAssemblyLineTypeDetailPerGroupViewSet(viewsets.ReadOnlyModelViewSet):
+class RamAssemblyLineTypeDetailPerGroupViewSet(StaticDataViewSet):
     """
     API endpoint that allows RamAssemblyLineTypeDetailPerGroups to be viewed.
     """
@@ -629,7 +817,7 @@ class RamAssemblyLineTypeDetailPerGroupViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = RamAssemblyLineTypeDetailPerGroupSerializer
 
 
-class RamAssemblyLineStationsViewSet(viewsets.ReadOnlyModelViewSet):
+class RamAssemblyLineStationsViewSet(StaticDataViewSet):
     """
     API endpoint that allows RamAssemblyLineStationss to be viewed.
     """
@@ -638,7 +826,7 @@ class RamAssemblyLineStationsViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = RamAssemblyLineStationsSerializer
 
 
-class StaServiceViewSet(viewsets.ReadOnlyModelViewSet):
+class StaServiceViewSet(StaticDataViewSet):
     """
     API endpoint that allows StaServices to be viewed.
     """
@@ -647,7 +835,7 @@ class StaServiceViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = StaServiceSerializer
 
 
-class StaStationViewSet(viewsets.ReadOnlyModelViewSet):
+class StaStationViewSet(StaticDataViewSet):
     """
     API endpoint that allows StaStations to be viewed.
     """
@@ -656,7 +844,7 @@ class StaStationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = StaStationSerializer
 
 
-class StaOperationViewSet(viewsets.ReadOnlyModelViewSet):
+class StaOperationViewSet(StaticDataViewSet):
     """
     API endpoint that allows StaOperations to be viewed.
     """
@@ -665,7 +853,7 @@ class StaOperationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = StaOperationSerializer
 
 
-class StaStationTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class StaStationTypeViewSet(StaticDataViewSet):
     """
     API endpoint that allows StaStationTypes to be viewed.
     """
@@ -674,7 +862,7 @@ class StaStationTypeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = StaStationTypeSerializer
 
 
-class StaOperationServicesViewSet(viewsets.ReadOnlyModelViewSet):
+class StaOperationServicesViewSet(StaticDataViewSet):
     """
     API endpoint that allows StaOperationServices to be viewed.
     """
@@ -683,7 +871,7 @@ class StaOperationServicesViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = StaOperationServicesSerializer
 
 
-class RamInstallationTypeContentViewSet(viewsets.ReadOnlyModelViewSet):
+class RamInstallationTypeContentViewSet(StaticDataViewSet):
     """
     API endpoint that allows RamInstallationTypeContents to be viewed.
     """
@@ -695,7 +883,7 @@ class RamInstallationTypeContentViewSet(viewsets.ReadOnlyModelViewSet):
 # System
 
 
-class EveUnitViewSet(viewsets.ReadOnlyModelViewSet):
+class EveUnitViewSet(StaticDataViewSet):
     """
     API endpoint that allows EveUnits to be viewed.
     """
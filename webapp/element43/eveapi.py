@@ -141,9 +141,17 @@ import httplib
 import urlparse
 import urllib
 import copy
+import socket
+import threading
+import weakref
 
+from collections import namedtuple
 from xml.parsers import expat
-from time import strptime
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+from time import strptime, time as _now
 from calendar import timegm
 
 proxy = None
@@ -151,6 +159,17 @@ proxySSL = False
 
 #-----------------------------------------------------------------------------
 
+def set_pool_size(size, timeout=None):
+    """Sets the number of persistent connections kept per API host (or proxy)
+    by this process. At most this many requests to the same host are in
+    flight at a time, further ones wait for a connection to become available.
+    If timeout is set, they give up after that many seconds and raise
+    socket.timeout.
+    """
+    global _pool
+    _pool = _ConnectionPool(size, timeout)
+
+
 def set_cast_func(func):
     """Sets an alternative value casting function for the XML parser.
     The function must have 2 arguments; key and value. It should return a
@@ -237,6 +256,18 @@ def ParseXML(file_or_string):
         raise TypeError("XML data must be provided as string or file-like object")
 
 
+def _APIError(code, message):
+    # returns the exception matching an API error code
+    if code >= 500:
+        return ServerError(code, message)
+    elif code >= 200:
+        return AuthenticationError(code, message)
+    elif code >= 100:
+        return RequestError(code, message)
+    else:
+        return Error(code, message)
+
+
 def _ParseXML(response, fromContext, storeFunc):
     # pre/post-process XML or Element data
 
@@ -251,14 +282,7 @@ def _ParseXML(response, fromContext, storeFunc):
 
     error = getattr(obj, "error", False)
     if error:
-        if error.code >= 500:
-            raise ServerError(error.code, error.data)
-        elif error.code >= 200:
-            raise AuthenticationError(error.code, error.data)
-        elif error.code >= 100:
-            raise RequestError(error.code, error.data)
-        else:
-            raise Error(error.code, error.data)
+        raise _APIError(error.code, error.data)
 
     result = getattr(obj, "result", False)
     if not result:
@@ -311,7 +335,7 @@ class _Context(object):
         # perform arcane attribute majick trick
         return _Context(self._root, self._path + "/" + this, self.parameters)
 
-    def __call__(self, **kw):
+    def _keywords(self, kw):
         if kw:
             # specified keywords override contextual ones
             for k, v in self.parameters.iteritems():
@@ -320,9 +344,16 @@ class _Context(object):
         else:
             # no keywords provided, just update with contextual ones.
             kw.update(self.parameters)
+        return kw
 
+    def __call__(self, **kw):
         # now let the root context handle it further
-        return self._root(self._path, **kw)
+        return self._root(self._path, **self._keywords(kw))
+
+    def stream(self, **kw):
+        # same as calling the context, except the response is parsed lazily
+        # while iterating over its rows. See StreamedResult below.
+        return self._root._stream(self._path, **self._keywords(kw))
 
 
 class _AuthContext(_Context):
@@ -338,6 +369,98 @@ class _AuthContext(_Context):
         return _Context(self._root, self._path + "/corp", self.parameters, {"characterID":characterID})
 
 
+class _ConnectionPool(object):
+    # Keeps idle keep-alive connections per (secure, address) key and limits
+    # the number of connections per key that may be in use at once.
+
+    def __init__(self, size, timeout=None):
+        self.size = size
+        self.timeout = timeout
+        self.lock = threading.Condition()
+        self.idle = {}
+        self.busy = {}
+
+    def acquire(self, key):
+        # returns an idle connection and True, or None and False if a new
+        # connection has to be made. Waits while all slots are in use, at
+        # most timeout seconds if one is set.
+        self.lock.acquire()
+        try:
+            if self.timeout is not None:
+                deadline = _now() + self.timeout
+            while self.busy.get(key, 0) >= self.size:
+                if self.timeout is None:
+                    self.lock.wait()
+                else:
+                    remaining = deadline - _now()
+                    if remaining <= 0:
+                        raise socket.timeout("no API connection available after %s seconds" % self.timeout)
+                    self.lock.wait(remaining)
+            self.busy[key] = self.busy.get(key, 0) + 1
+
+            idle = self.idle.get(key)
+            if idle:
+                return idle.pop(), True
+            return None, False
+        finally:
+            self.lock.release()
+
+    def release(self, key, conn, reusable):
+        if conn is not None and not reusable:
+            conn.close()
+        self.lock.acquire()
+        try:
+            if conn is not None and reusable:
+                self.idle.setdefault(key, []).append(conn)
+            self.busy[key] -= 1
+            self.lock.notify()
+        finally:
+            self.lock.release()
+
+
+def _connect(key):
+    secure, address = key
+    if secure:
+        return httplib.HTTPSConnection(*address)
+    return httplib.HTTPConnection(*address)
+
+
+class _PooledResponse(object):
+    # Wraps a response of a pooled connection. The connection is handed back
+    # to the pool as soon as the response has been read completely, or
+    # closed if the response is dropped before that.
+
+    def __init__(self, pool, key, conn, response):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+
+    def read(self, *args):
+        data = self._response.read(*args)
+        if self._conn is not None and self._response.isclosed():
+            conn, self._conn = self._conn, None
+            self._pool.release(self._key, conn, not self._response.will_close)
+        return data
+
+    def close(self):
+        # drops the connection unless it went back to the pool already
+        self._response.close()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(self._key, conn, False)
+
+    def __getattr__(self, this):
+        return getattr(self._response, this)
+
+    def __del__(self):
+        self.close()
+
+
+# persistent connections of this process, see set_pool_size()
+_pool = _ConnectionPool(4)
+
+
 class _RootContext(_Context):
 
     def auth(self, **kw):
@@ -348,6 +471,66 @@ class _RootContext(_Context):
     def setcachehandler(self, handler):
         self._root._handler = handler
 
+    def _request(self, path, kw):
+        # sends the request over a pooled keep-alive connection and returns
+        # the response, ready to be read.
+        if self._proxy is None:
+            req = path
+            key = (self._scheme == "https", (self._host,))
+        else:
+            req = self._scheme+'://'+self._host+path
+            key = (bool(self._proxySSL), tuple(self._proxy))
+
+        if kw:
+            request = ("POST", req, urllib.urlencode(kw), {"Content-type": "application/x-www-form-urlencoded", "User-Agent": "Element43 API Client/git (Git)"})
+        else:
+            request = ("GET", req, None, {"User-Agent": "Element43 API Client/git (Git)"})
+
+        pool = _pool
+        conn, reused = pool.acquire(key)
+        try:
+            while True:
+                if conn is None:
+                    conn = _connect(key)
+                try:
+                    conn.request(*request)
+                    response = conn.getresponse()
+                    break
+                except (httplib.HTTPException, socket.error):
+                    conn.close()
+                    conn = None
+                    if not reused:
+                        raise
+                    # the server closed the idle connection in the meantime.
+                    # retry once on a new one.
+                    reused = False
+        except:
+            pool.release(key, conn, False)
+            raise
+
+        response = _PooledResponse(pool, key, conn, response)
+
+        if response.status != 200:
+            # read the body, so the connection can be used again
+            response.read()
+            if response.status == httplib.NOT_FOUND:
+                raise AttributeError("'%s' not available on API server (404 Not Found)" % path)
+            elif response.status == httplib.FORBIDDEN:
+                raise AuthenticationError(response.status, 'HTTP 403 - Forbidden')
+            else:
+                raise ServerError(response.status, "'%s' request failed (%s)" % (path, response.reason))
+
+        return response
+
+    def _stream(self, path, **kw):
+        # streamed calls always go to the server, the cache handler only
+        # deals with complete documents.
+        for k, v in kw.iteritems():
+            if isinstance(v, _listtypes):
+                kw[k] = ','.join(map(str, list(v)))
+
+        return StreamedResult(self._request(path + ".xml.aspx", kw))
+
     def __call__(self, path, **kw):
         # convert list type arguments to something the API likes
         for k, v in kw.iteritems():
@@ -365,32 +548,7 @@ class _RootContext(_Context):
             response = None
 
         if response is None:
-            if self._proxy is None:
-                req = path
-                if self._scheme == "https":
-                    conn = httplib.HTTPSConnection(self._host)
-                else:
-                    conn = httplib.HTTPConnection(self._host)
-            else:
-                req = self._scheme+'://'+self._host+path
-                if self._proxySSL:
-                    conn = httplib.HTTPSConnection(*self._proxy)
-                else:
-                    conn = httplib.HTTPConnection(*self._proxy)
-
-            if kw:
-                conn.request("POST", req, urllib.urlencode(kw), {"Content-type": "application/x-www-form-urlencoded", "User-Agent": "Element43 API Client/git (Git)"})
-            else:
-                conn.request("GET", req, headers={"User-Agent": "Element43 API Client/git (Git)"})
-
-            response = conn.getresponse()
-            if response.status != 200:
-                if response.status == httplib.NOT_FOUND:
-                    raise AttributeError("'%s' not available on API server (404 Not Found)" % path)
-                elif response.status == httplib.FORBIDDEN:
-                    raise AuthenticationError(response.status, 'HTTP 403 - Forbidden')
-                else:
-                    raise ServerError(response.status, "'%s' request failed (%s)" % (path, response.reason))
+            response = self._request(path, kw)
 
             if cache:
                 store = True
@@ -426,13 +584,9 @@ def _autocast(key, value):
     except ValueError:
         pass
 
-    try:
-        return float(value)
-    except ValueError:
-        pass
-
     if len(value) == 19 and value[10] == ' ':
-        # it could be a date string
+        # it could be a date string. checked before floats, so dates don't
+        # pay for a failed float conversion.
         try:
             return max(0, int(timegm(strptime(value, "%Y-%m-%d %H:%M:%S"))))
         except OverflowError:
@@ -440,6 +594,11 @@ def _autocast(key, value):
         except ValueError:
             pass
 
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
     # couldn't cast. return string unchanged.
     return value
 
@@ -989,3 +1148,168 @@ class FilterRowset(object):
     def __setstate__(self, state):
         self._cols, self._rows, self._items, self.key, self.key2 = state
         self._bind()
+
+
+#-----------------------------------------------------------------------------
+# Streamed Results
+#-----------------------------------------------------------------------------
+# Streamed API calls (context.stream(**kw)) don't build Row and Rowset
+# objects. Their response is parsed incrementally while it is read from the
+# server and every row is handed out as a namedtuple and discarded by the
+# parser right away, so large pages like WalletTransactions(rowCount=2560)
+# never sit in memory as a whole.
+#-----------------------------------------------------------------------------
+
+# namedtuple classes of streamed rows by their fields
+_rowclasses = {}
+
+# parsed columns attributes of rowsets
+_rowsetcolumns = {}
+
+def _rowclass(fields):
+    cls = _rowclasses.get(fields)
+    if cls is None:
+        cls = _rowclasses[fields] = namedtuple("StreamedRow", fields, rename=True)
+    return cls
+
+
+def StreamXML(file_or_string):
+    if type(file_or_string) in (str, unicode):
+        from cStringIO import StringIO
+        file_or_string = StringIO(file_or_string)
+    elif not hasattr(file_or_string, "read"):
+        raise TypeError("XML data must be provided as string or file-like object")
+    return StreamedResult(file_or_string)
+
+
+class StreamedResult(object):
+    # A StreamedResult iterates over the rows of the rowsets inside <result>.
+    # Its fields are accessed as attributes by column name, like with Row
+    # objects. Nested rowsets (e.g. the contents of assets) become a list of
+    # rows in a field named after the rowset, nested tags a field of their own.
+    #
+    # API errors are raised when the call is made. currentTime is available
+    # right away, simple tags inside <result> as soon as the parser has passed
+    # them and cachedUntil once all rows have been consumed. Like with normal
+    # results, the metadata is also available through _meta.
+    #
+    # Rows can only be iterated over once. The source (and with it the
+    # connection of an API call) is closed once all rows have been consumed.
+    # The following methods are provided:
+    #
+    #   rows(name=None)
+    #     Yields the rows of the rowset with the given name, skipping all
+    #     others. Yields the rows of all rowsets if no name is given.
+    #
+    #   close()
+    #     Stops parsing and closes the source. Call it when not all rows are
+    #     consumed, abandoned results are also closed once they are dropped.
+    #
+
+    def __init__(self, source):
+        self.currentTime = self.cachedUntil = None
+
+        # the parser only gets a weak reference, so dropping the result frees
+        # (and closes) it right away instead of waiting for the cyclic GC.
+        self._parser = self._parse(weakref.proxy(self), source)
+
+        # parse everything up to <result>, so errors are raised right away.
+        for item in self._parser:
+            break
+
+    @property
+    def _meta(self):
+        return self
+
+    @staticmethod
+    def _parse(result, source):
+        # yields None once <result> has been reached, then (rowset name, row)
+        # tuples, removing every row from the tree once it has been handed out.
+        # result is a weak proxy, see __init__.
+        try:
+            for item in StreamedResult._events(result, ElementTree.iterparse(source, events=("start", "end"))):
+                yield item
+        finally:
+            if hasattr(source, "close"):
+                source.close()
+
+    @staticmethod
+    def _events(result, events):
+        path = []
+        for event, elem in events:
+            if event == "start":
+                path.append(elem)
+                if len(path) == 1:
+                    if elem.tag != "eveapi" or "version" not in elem.attrib:
+                        raise RuntimeError("Invalid API response")
+                    result.version = elem.get("version")
+                elif len(path) == 2 and elem.tag == "result":
+                    yield None
+                continue
+
+            path.pop()
+            depth = len(path)
+
+            if depth == 1:
+                if elem.tag == "error":
+                    raise _APIError(_castfunc("code", elem.get("code")), elem.text or "")
+                elif elem.tag == "result":
+                    result.result = True
+                else:
+                    setattr(result, elem.tag, _castfunc(elem.tag, elem.text or ""))
+                path[0].remove(elem)
+
+            elif depth == 2 and path[1].tag == "result":
+                if elem.tag != "rowset":
+                    setattr(result, elem.tag, _castfunc(elem.tag, elem.text or ""))
+                path[1].remove(elem)
+
+            elif depth == 3 and path[1].tag == "result" and path[2].tag == "rowset" and elem.tag == "row":
+                rowset = path[2]
+                yield rowset.get("name"), result._row(rowset, elem)
+                rowset.remove(elem)
+
+        if not getattr(result, "result", False):
+            raise RuntimeError("API object does not contain result")
+
+    def _row(self, rowset, elem):
+        # builds the namedtuple of a complete <row> element
+        columns = _rowsetcolumns.get(rowset.get("columns", ""))
+        if columns is None:
+            columns = [col for col in rowset.get("columns", "").replace(" ", "").split(",") if col]
+            _rowsetcolumns[rowset.get("columns", "")] = columns
+        attrib = elem.attrib
+
+        # attributes that were not defined in the rowset, such as rawQuantity
+        # in asset lists, are added after the defined columns. Missing ones
+        # are set to None.
+        fields = columns + [key for key in attrib if key not in columns]
+        values = [_castfunc(key, attrib[key]) if key in attrib else None for key in fields]
+
+        for child in elem:
+            if child.tag == "rowset":
+                fields.append(child.get("name"))
+                values.append([self._row(child, row) for row in child if row.tag == "row"])
+            else:
+                fields.append(child.tag)
+                values.append(_castfunc(child.tag, child.text or ""))
+
+        if elem.text and elem.text.strip():
+            # anonymous data inside rows, like the bodies of mails
+            fields.append("data")
+            values.append(_castfunc("data", elem.text))
+
+        return _rowclass(tuple(fields))(*values)
+
+    def rows(self, name=None):
+        for rowset, row in self._parser:
+            if name is None or rowset == name:
+                yield row
+
+    def close(self):
+        self._parser.close()
+
+    __iter__ = rows
+
+    def __str__(self):
+        return "<StreamedResult cachedUntil=%s>" % self.cachedUntil
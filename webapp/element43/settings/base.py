@@ -130,6 +130,27 @@ MEMCACHE_BINARY = True
 MEMCACHE_BEHAVIOUR = {"tcp_nodelay": True,
                       "ketama": True}
 
+# Connections per process - should be at least the number of threads serving requests
+MEMCACHE_POOL_SIZE = 10
+
+# Seconds between two log entries with memcache statistics
+MEMCACHE_STATS_INTERVAL = 300
+
+# Persistent connections to the EVE API per worker process, also the number of concurrent API requests per process
+EVEAPI_POOL_SIZE = 4
+
+# Seconds an API request waits for one of those connections before giving up
+EVEAPI_POOL_TIMEOUT = 120
+
+# Redis settings (hot book tracking)
+REDIS_HOST = 'localhost'
+
+# Version of the imported static data export - bump after importing a new SDE to invalidate cached static data
+SDE_VERSION = '1'
+
+# Server-sent events endpoint of pricestream.py - the front page polls for stats if empty
+PRICE_STREAM_URL = ''
+
 # Store flash messages in session
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 
@@ -335,6 +356,10 @@ LOGGING = {
             'level': 'ERROR',
             'filters': ['require_debug_false'],
             'class': 'django.utils.log.AdminEmailHandler'
+        },
+        'console': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler'
         }
     },
     'loggers': {
@@ -343,6 +368,10 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        'apps.common.util': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
     }
 }
 
@@ -23,6 +23,10 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "element43.settings")
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
 
+# Build the name search index of this worker in the background, before the first search needs it
+from apps.common.search import warm_index
+warm_index()
+
 # Apply WSGI middleware here.
 # from helloworld.wsgi import HelloWorldApplication
 # application = HelloWorldApplication(application)
@@ -1,5 +1,6 @@
 #
-# This script generated a JSON tree for the market browser and is automatically run with prepare_static.sh
+# This script generates the JSON tree and the panel contents of the market browser in one pass
+# and is automatically run with prepare_static.sh
 #
 
 # Import JSON module
@@ -19,65 +20,49 @@ from django.db import connection
 from apps.common.util import dictfetchall
 
 
-def recadder(node):
+def icon_file(iconid):
     """
-    Function for recursively traversing the tree.
+    Returns the file name of an icon in the icon set of the CDN.
     """
 
-    if not node['has_items']:
-        if not 'children' in node:
-            node['children'] = []
-
-        cursor.execute('SELECT * FROM (SELECT * FROM eve_db_invmarketgroup WHERE parent_id = ' + str(node['id']) + ' ORDER BY name) as main ORDER BY has_items')
-        res = dictfetchall(cursor)
-
-        for new_node in res:
-            node['children'].append(recadder(new_node))
-
-    # Casting and stuff to make dynatree happy
-    isFolder = not bool(node['has_items'])
-    del node['has_items']
-    node['isFolder'] = isFolder
-    node['noLink'] = isFolder
-
-    # Set title
-    title = node['name']
-    del node['name']
-    node['title'] = title
-
-    # Add tooltip
-    tooltip = node['description']
-    del node['description']
-    node['tooltip'] = tooltip
-
-    # Set icon
-    iconid = node['icon_id']
-    del node['icon_id']
-
     # Add proper icon ids
     if (iconid and iconid in icons):
         string = icons[iconid]['iconFile']
 
         # Handle different formats
         if 'res:/UI/Texture/Icons/' in string:
-            node['icon'] = string.replace('res:/UI/Texture/Icons/', '')
+            return string.replace('res:/UI/Texture/Icons/', '')
         elif 'res:' in string:
-            node['icon'] = '22_42.png'
+            return '22_42.png'
         else:
             # Remove leading zeros
             for i in range(0, 10):
                 string = string.replace('0'+str(i), str(i))
-            node['icon'] = string + '.png'
+            return string + '.png'
     else:
         # Default icon
-        node['icon'] = '22_42.png'
+        return '22_42.png'
+
+
+def build_node(group):
+    """
+    Function for recursively building the tree from the loaded groups.
+    """
 
-    # Set ID
-    key = node['id']
-    del node['id']
-    node['key'] = key
+    # Casting and stuff to make dynatree happy
+    isFolder = not bool(group['has_items'])
 
-    del node['parent_id']
+    node = {'key': group['id'],
+            'title': group['name'],
+            'tooltip': group['description'],
+            'icon': icon_file(group['icon_id']),
+            'isFolder': isFolder,
+            'noLink': isFolder}
+
+    if isFolder:
+        # Subgroups first, groups with items after them - both by name
+        node['children'] = [build_node(child) for child in sorted(children.get(group['id'], []),
+                                                                  key=lambda child: (child['has_items'], child['name']))]
 
     return node
 
@@ -90,18 +75,36 @@ icons = load(icon_yaml)
 # Initialize database connection
 cursor = connection.cursor()
 
-# Select Root Groups
-cursor.execute("SELECT * FROM eve_db_invmarketgroup WHERE parent_id IS NULL ORDER BY name")
-result = dictfetchall(cursor)
+# Load all groups at once and index them by parent
+cursor.execute("SELECT id, parent_id, name, description, icon_id, has_items FROM eve_db_invmarketgroup")
+
+children = {}
+names = {}
 
-# Initialize tree structure
-tree = []
+for group in dictfetchall(cursor):
+    children.setdefault(group['parent_id'], []).append(group)
+    names[group['id']] = group['name']
 
-# Start traversing
-for node in result:
-    tree.append(recadder(node))
+# Build the tree from the root groups
+tree = [build_node(group) for group in sorted(children.get(None, []), key=lambda group: group['name'])]
 
-# Write file into appropiate asset folder
+# Load all published types at once - the market browser panel of each group lists its types
+cursor.execute("SELECT id, market_group_id, name, description FROM eve_db_invtype "
+               "WHERE is_published = TRUE AND market_group_id IS NOT NULL ORDER BY name")
+
+panels = dict((group_id, {'name': name, 'types': []}) for group_id, name in names.iteritems())
+
+for invtype in dictfetchall(cursor):
+    panels[invtype['market_group_id']]['types'].append({'id': invtype['id'],
+                                                        'name': invtype['name'],
+                                                        'description': invtype['description']})
+
+# Write files into appropiate asset folder
 json_file = open("element43/apps/market_browser/static/javascripts/groups.json", "w")
 json_file.write(json.dumps(tree))
 json_file.close()
+
+# Panels are read by the market browser, JSON keys are strings
+json_file = open("element43/apps/market_browser/static/javascripts/panels.json", "w")
+json_file.write(json.dumps(panels))
+json_file.close()